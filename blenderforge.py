@@ -3,12 +3,30 @@ import textwrap
 import threading
 import re
 import json
-import urllib.request
 import urllib.error
+import urllib.parse
+import http.client
+import contextlib
+import io
 import ssl
 import base64
+import binascii
+import zlib
 import os
 import tempfile
+import time
+import hashlib
+import random
+import email.utils
+import concurrent.futures
+import queue
+import functools
+import collections
+import socket
+import itertools
+import weakref
+import struct
+import numpy as np
 
 bl_info = {
     "name": "BlenderForge",
@@ -25,7 +43,6 @@ bl_info = {
 _chat_history = []
 _status = "⚪ Ready"
 _model_info = ""
-_stop_requested = False
 _last_activity = ""
 _texture_path = ""
 _history_index = -1  # Current position in response history
@@ -81,14 +98,127 @@ class ForgePreferences(bpy.types.AddonPreferences):
         default=False
     )
     
+    derive_maps: bpy.props.BoolProperty(
+        name="Derive Maps Locally",
+        description="HQ Mode: compute Roughness, Normal and AO from the base color instead of generating each with an extra API call",
+        default=True
+    )
+    
+    pack_orm: bpy.props.BoolProperty(
+        name="Pack ORM Texture",
+        description="PBR: pack AO, Roughness and Metallic into the R/G/B channels of one image (fewer textures and samplers, glTF/Unity layout)",
+        default=False
+    )
+    
+    stream_responses: bpy.props.BoolProperty(
+        name="Stream Responses",
+        description="Show Code AI replies while they are being generated",
+        default=True
+    )
+    
+    context_budget: bpy.props.IntProperty(
+        name="Context Budget (tokens)",
+        description="Max estimated tokens of chat history + system prompt sent per Code AI request",
+        default=8000,
+        min=1000
+    )
+    
+    keep_turns: bpy.props.IntProperty(
+        name="Full Turns Kept",
+        description="Most recent exchanges sent verbatim; older ones are summarized",
+        default=3,
+        min=1,
+        max=20
+    )
+    
+    context_cache: bpy.props.BoolProperty(
+        name="Server Context Cache",
+        description="Register the static system prompt with the API once and refer to it by handle. Only available once the prompt reaches the model's cache minimum (falls back to inline)",
+        default=False
+    )
+    
+    response_cache: bpy.props.BoolProperty(
+        name="Reuse Identical Replies",
+        description="Answer a repeated request against an unchanged scene from the on-disk cache",
+        default=False
+    )
+    
+    hedge_requests: bpy.props.BoolProperty(
+        name="Hedge Slow Requests",
+        description="Send a duplicate Code AI request when the first is slower than usual (p90) and keep whichever answers first",
+        default=False
+    )
+    
+    hedge_budget: bpy.props.IntProperty(
+        name="Hedges / Minute",
+        description="Maximum duplicate requests sent per minute (caps the extra API spend)",
+        default=6,
+        min=0,
+        max=60
+    )
+    
+    max_workers: bpy.props.IntProperty(
+        name="Parallel Requests",
+        description="Maximum texture requests in flight at once",
+        default=4,
+        min=1,
+        max=16
+    )
+    
+    cache_dir: bpy.props.StringProperty(
+        name="Cache Folder",
+        description="Where generated textures are kept between sessions (empty = Blender user data folder)",
+        default="",
+        subtype='DIR_PATH'
+    )
+    
+    cache_size_mb: bpy.props.IntProperty(
+        name="Cache Budget (MB)",
+        description="Least recently used textures are deleted once the cache grows past this size",
+        default=2048,
+        min=64
+    )
+    
+    pool_size: bpy.props.IntProperty(
+        name="Connection Pool",
+        description="Persistent HTTPS connections kept open to the API (avoids a TLS handshake per request)",
+        default=4,
+        min=1,
+        max=16
+    )
+    
     def draw(self, context):
         layout = self.layout
         layout.prop(self, "api_key")
         layout.prop(self, "model")
         layout.prop(self, "auto_execute")
+        layout.prop(self, "stream_responses")
+        row = layout.row(align=True)
+        row.prop(self, "context_budget")
+        row.prop(self, "keep_turns")
+        # The API only caches contexts above a minimum size - grey out until the rules reach it
+        rules = estimate_tokens(get_system(project=False))
+        minimum = ContextCache.min_tokens(self.model)
+        row = layout.row()
+        row.enabled = rules >= minimum
+        row.prop(self, "context_cache")
+        if not row.enabled:
+            layout.label(text=f"Context cache: rules ≈{rules} tokens, API minimum {minimum} - sent inline", icon='INFO')
+        layout.prop(self, "response_cache")
+        row = layout.row(align=True)
+        row.prop(self, "hedge_requests")
+        row.prop(self, "hedge_budget")
         layout.prop(self, "texture_size")
         layout.prop(self, "auto_apply")
         layout.prop(self, "hq_mode")
+        layout.prop(self, "derive_maps")
+        layout.prop(self, "pack_orm")
+        layout.prop(self, "max_workers")
+        layout.prop(self, "pool_size")
+        row = layout.row(align=True)
+        row.prop(self, "cache_dir")
+        row.prop(self, "cache_size_mb", text="MB")
+        row.operator("forge.clear_cache", text="", icon='TRASH')
         layout.separator()
         layout.label(text=f"Status: {_status}")
 
@@ -105,6 +235,34 @@ def is_auto():
     p = bpy.context.preferences.addons.get(__name__)
     return p.preferences.auto_execute if p else True
 
+def is_streaming():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.stream_responses if p else True
+
+def get_context_budget():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.context_budget if p else 8000
+
+def get_keep_turns():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.keep_turns if p else 3
+
+def is_context_cache():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.context_cache if p else False
+
+def is_response_cache():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.response_cache if p else False
+
+def is_hedging():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.hedge_requests if p else False
+
+def get_hedge_budget():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.hedge_budget if p else 6
+
 def get_texture_size():
     p = bpy.context.preferences.addons.get(__name__)
     return p.preferences.texture_size if p else "2K"
@@ -117,6 +275,36 @@ def is_hq_mode():
     p = bpy.context.preferences.addons.get(__name__)
     return p.preferences.hq_mode if p else False
 
+def is_derive_maps():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.derive_maps if p else True
+
+def is_pack_orm():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.pack_orm if p else False
+
+def get_max_workers():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.max_workers if p else 4
+
+def get_pool_size():
+    p = bpy.context.preferences.addons.get(__name__)
+    return p.preferences.pool_size if p else 4
+
+def get_cache_root():
+    p = bpy.context.preferences.addons.get(__name__)
+    path = bpy.path.abspath(p.preferences.cache_dir) if p and p.preferences.cache_dir else ""
+    if not path:
+        try:
+            path = bpy.utils.user_resource('DATAFILES', path="blenderforge")
+        except:
+            path = os.path.join(tempfile.gettempdir(), "blenderforge")
+    return path
+
+def get_cache_budget():
+    p = bpy.context.preferences.addons.get(__name__)
+    return (p.preferences.cache_size_mb if p else 2048) * 1024 * 1024
+
 def model_name():
     m = get_model()
     return "⚡Flash" if "flash" in m else "🧠Pro"
@@ -126,29 +314,130 @@ def model_name():
 # Project Context (stored in Scene - persists with .blend file)
 # =============================================================================
 
+LOG_MAX_ENTRIES = 50
+LOG_FLUSH_INTERVAL = 5.0  # Seconds between lazy writes to the scene
+
+
+class ProjectLog:
+    """Thread-safe ring buffer of structured log entries (O(1) append).
+    
+    Entries: {"t": timestamp, "level": INFO|ERROR, "cat": CODE|TEXTURE|UV|..., "msg": text}.
+    Persisted to scene.forge_project_log lazily (on save and every LOG_FLUSH_INTERVAL).
+    """
+    
+    def __init__(self, maxlen=LOG_MAX_ENTRIES):
+        self.entries = collections.deque(maxlen=maxlen)
+        self.scene_name = None
+        self.version = 0
+        self.saved_version = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def make_entry(message, level=None, category=None, t=None):
+        """Structured entry from '[CAT] message' style text."""
+        m = re.match(r'\[(\w+)\]\s*(.*)', message, re.DOTALL)
+        if m and category is None:
+            category, message = m.group(1), m.group(2)
+        if level is None:
+            level = "ERROR" if category == "ERROR" or "fail" in message.lower() else "INFO"
+        return {"t": t or time.time(), "level": level, "cat": category or "", "msg": message}
+    
+    @staticmethod
+    def format(entry):
+        return f"[{entry['cat']}] {entry['msg']}" if entry['cat'] else entry['msg']
+    
+    def append(self, message, level=None, category=None):
+        entry = self.make_entry(message, level, category)
+        with self._lock:
+            self.entries.append(entry)
+            self.version += 1
+        _panel_state.invalidate('log')
+    
+    def lines(self, last=None):
+        """Formatted entries, oldest first (optionally only the last n)."""
+        with self._lock:
+            entries = list(self.entries)
+        if last is not None:
+            entries = entries[-last:]
+        return [self.format(e) for e in entries]
+    
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.version += 1
+        _panel_state.invalidate('log')
+    
+    def load(self, scene):
+        """Bind to scene and read its persisted log (legacy plain-string lists too)."""
+        try:
+            stored = json.loads(scene.forge_project_log) if scene.forge_project_log else []
+        except:
+            stored = []
+        entries = [e if isinstance(e, dict) else self.make_entry(str(e), t=0) for e in stored]
+        with self._lock:
+            self.entries.clear()
+            self.entries.extend(entries)
+            self.scene_name = scene.name_full
+            self.version = self.saved_version = 0
+        _panel_state.invalidate('log')
+    
+    def flush(self):
+        """Write to the bound scene if changed (main thread only)."""
+        if self.version == self.saved_version or self.scene_name is None:
+            return
+        scene = bpy.data.scenes.get(self.scene_name)
+        if scene is None:
+            return
+        with self._lock:
+            data = json.dumps(list(self.entries))
+            version = self.version
+        scene.forge_project_log = data
+        self.saved_version = version
+
+
+_project_log = ProjectLog()
+
+
 def get_project_log(scene):
-    """Get project log from scene (JSON stored in string property)."""
+    """Project log lines for scene - read-only, so safe in draw().
+    
+    A scene the ring buffer isn't bound to yet shows its persisted log until
+    rebind_project_log (depsgraph handler / flush timer) switches over.
+    """
+    if _project_log.scene_name == scene.name_full:
+        return _project_log.lines()
     try:
-        log_str = scene.forge_project_log
-        if log_str:
-            return json.loads(log_str)
+        stored = json.loads(scene.forge_project_log) if scene.forge_project_log else []
     except:
-        pass
-    return []
+        stored = []
+    return [ProjectLog.format(e) if isinstance(e, dict) else str(e) for e in stored]
 
 
-def set_project_log(scene, log_list):
-    """Save project log to scene."""
-    scene.forge_project_log = json.dumps(log_list[-50:])  # Keep max 50
+def rebind_project_log(scene):
+    """Follow the active scene: persist the old scene's log and load the new one.
+    
+    Writes scene data, so never call it from draw().
+    """
+    if scene is not None and _project_log.scene_name != scene.name_full:
+        _project_log.flush()
+        _project_log.load(scene)
 
 
-def log_action(action):
-    """Add action to project log (stored in current scene)."""
+@bpy.app.handlers.persistent
+def flush_project_log(*args):
+    """Timer / save_pre handler: persist the log lazily (and follow scene switches)."""
     try:
-        scene = bpy.context.scene
-        log = get_project_log(scene)
-        log.append(action)
-        set_project_log(scene, log)
+        rebind_project_log(bpy.context.scene)
+        _project_log.flush()
+    except:
+        pass
+    return LOG_FLUSH_INTERVAL
+
+
+def log_action(action, level=None):
+    """Add action to project log - safe from any thread, no JSON work."""
+    try:
+        _project_log.append(action, level)
     except:
         pass
 
@@ -204,8 +493,11 @@ def get_project_profile(scene):
 
 
 def set_project_profile(scene, profile):
-    """Save project profile to scene."""
+    """Save project profile to scene (re-pointing materials if the texture tier changed)."""
+    old_tier = target_tier(get_project_profile(scene))
     scene.forge_project_profile = json.dumps(profile)
+    if target_tier(profile) != old_tier:
+        retier_materials(target_tier(profile))
 
 
 def infer_profile_from_description(description):
@@ -227,37 +519,31 @@ JSON format:
 Return ONLY valid JSON, no explanation.'''
 
     try:
-        model = get_model()
-        version = "v1alpha" if "preview" in model else "v1beta"
-        url = f"https://generativelanguage.googleapis.com/{version}/models/{model}:generateContent?key={get_key()}"
+        url = api_url(get_model())
         
         payload = {
             "contents": [{"role": "user", "parts": [{"text": prompt}]}],
             "generationConfig": {"temperature": 0.1, "maxOutputTokens": 500}
         }
         
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
+        result = api_post(url, payload, timeout=30)
         
-        with urllib.request.urlopen(req, context=ssl.create_default_context(), timeout=30) as resp:
-            result = json.loads(resp.read().decode('utf-8'))
+        if 'candidates' in result and result['candidates']:
+            text = result['candidates'][0].get('content', {}).get('parts', [{}])[0].get('text', '')
+            # Extract JSON from response
+            text = text.strip()
+            if text.startswith('```'):
+                text = re.sub(r'^```\w*\n?', '', text)
+                text = re.sub(r'\n?```$', '', text)
+            
+            profile = json.loads(text)
+            # Validate and merge with defaults
+            validated = DEFAULT_PROFILE.copy()
+            for key in DEFAULT_PROFILE:
+                if key in profile:
+                    validated[key] = profile[key]
+            return validated
             
-            if 'candidates' in result and result['candidates']:
-                text = result['candidates'][0].get('content', {}).get('parts', [{}])[0].get('text', '')
-                # Extract JSON from response
-                text = text.strip()
-                if text.startswith('```'):
-                    text = re.sub(r'^```\w*\n?', '', text)
-                    text = re.sub(r'\n?```$', '', text)
-                
-                profile = json.loads(text)
-                # Validate and merge with defaults
-                validated = DEFAULT_PROFILE.copy()
-                for key in DEFAULT_PROFILE:
-                    if key in profile:
-                        validated[key] = profile[key]
-                return validated
-                
     except Exception as e:
         log_action(f"[PROFILE] Inference failed: {str(e)[:40]}")
     
@@ -325,317 +611,2364 @@ def set_status(s, activity=""):
 
 
 # =============================================================================
-# Code Generation API
+# Main-Thread Dispatch (one queue, one persistent timer)
 # =============================================================================
 
-def call_api(messages, system=None):
-    global _status, _model_info, _stop_requested
-    
-    key = get_key()
-    if not key:
-        log_action("[ERROR] No API key configured")
-        raise Exception("No API Key - Set it in Preferences")
-    
-    if _stop_requested:
-        raise Exception("Stopped by user")
-    
-    model = get_model()
-    _model_info = model_name()
-    set_status(f"🔄 {_model_info} thinking...", "Sending request")
-    
-    version = "v1alpha" if "preview" in model else "v1beta"
-    url = f"https://generativelanguage.googleapis.com/{version}/models/{model}:generateContent?key={key}"
-    
-    payload = {"contents": messages, "generationConfig": {"temperature": 0.7, "maxOutputTokens": 8192}}
-    if system:
-        payload["systemInstruction"] = {"parts": [{"text": system}]}
+_main_queue = queue.Queue()
+MAIN_QUEUE_BUDGET = 0.02    # Seconds of queued work per timer tick
+MAIN_QUEUE_INTERVAL = 0.05  # Idle poll interval
+
+
+def run_on_main(fn, *args):
+    """Queue fn(*args) to run on Blender's main thread (thread-safe, FIFO order)."""
+    _main_queue.put((fn, args))
+
+
+def call_on_main(fn, *args):
+    """Run fn(*args) on the main thread and return its result (blocks a worker thread).
     
-    try:
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
-        
-        set_status(f"🔄 {_model_info} generating...", "Waiting for response")
-        
-        with urllib.request.urlopen(req, context=ssl.create_default_context(), timeout=90) as resp:
-            result = json.loads(resp.read().decode('utf-8'))
-            
-            # Check for safety blocks
-            if 'promptFeedback' in result:
-                block = result['promptFeedback'].get('blockReason')
-                if block:
-                    log_action(f"[ERROR] Content blocked: {block}")
-                    raise Exception(f"Content blocked: {block}")
-            
-            if 'candidates' in result and result['candidates']:
-                candidate = result['candidates'][0]
-                
-                # Check finish reason
-                finish = candidate.get('finishReason', '')
-                if finish == 'SAFETY':
-                    log_action("[ERROR] Response blocked by safety filter")
-                    raise Exception("Response blocked by safety filter")
-                
-                text = candidate.get('content', {}).get('parts', [{}])[0].get('text', '')
-                set_status(f"✅ {_model_info} done", "Response received")
-                return text
-            
-            log_action("[ERROR] Empty response from API")
-            set_status(f"⚠️ Empty response", "No content")
-            return ""
-            
-    except urllib.error.HTTPError as e:
-        error_details = parse_api_error(e)
-        log_action(f"[ERROR] HTTP {e.code}: {error_details['message']}")
-        set_status(f"❌ {error_details['status']}", error_details['message'][:30])
-        raise Exception(error_details['message'])
+    Keeps a cancelled job from waiting on a busy queue; on the main thread fn runs directly.
+    """
+    if threading.current_thread() is threading.main_thread():
+        return fn(*args)
+    future = concurrent.futures.Future()
     
-    except urllib.error.URLError as e:
-        log_action(f"[ERROR] Network: {str(e.reason)}")
-        set_status("❌ Network Error", str(e.reason)[:30])
-        raise Exception(f"Network error: {e.reason}")
+    def run():
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
     
-    except json.JSONDecodeError as e:
-        log_action(f"[ERROR] Invalid JSON response")
-        set_status("❌ Parse Error", "Invalid response")
-        raise Exception("Invalid API response format")
+    run_on_main(run)
+    while True:
+        try:
+            return future.result(timeout=0.25)
+        except concurrent.futures.TimeoutError:
+            if is_cancelled():
+                future.cancel()
+                check_cancelled()
 
 
-def parse_api_error(e):
-    """Parse HTTP error into detailed info."""
+def redraw_view3d():
     try:
-        body = e.read().decode('utf-8') if e.fp else ""
-        error_json = json.loads(body) if body else {}
-        msg = error_json.get('error', {}).get('message', '')
-        code = error_json.get('error', {}).get('code', e.code)
+        for window in bpy.context.window_manager.windows:
+            for area in window.screen.areas:
+                if area.type == 'VIEW_3D':
+                    area.tag_redraw()
     except:
-        msg = ""
-        code = e.code
+        pass
+
+
+def drain_main_queue():
+    """Persistent timer: run queued callbacks in order within a per-tick time budget."""
+    deadline = time.perf_counter() + MAIN_QUEUE_BUDGET
+    ran = False
+    while time.perf_counter() < deadline:
+        try:
+            fn, args = _main_queue.get_nowait()
+        except queue.Empty:
+            break
+        ran = True
+        try:
+            fn(*args)
+        except Exception as e:
+            log_action(f"[ERROR] {getattr(fn, '__name__', 'task')}: {str(e)[:40]}")
     
-    # Human-readable error messages
-    if e.code == 400:
-        if 'API_KEY' in msg.upper() or 'key' in msg.lower():
-            return {"status": "Invalid Key", "message": "API key is invalid - get new one at aistudio.google.com"}
-        elif 'model' in msg.lower():
-            return {"status": "Model Error", "message": f"Model not available: {msg[:50]}"}
-        else:
-            return {"status": f"Bad Request", "message": msg[:80] or "Invalid request"}
-    elif e.code == 401:
-        return {"status": "Unauthorized", "message": "API key unauthorized - check permissions"}
-    elif e.code == 403:
-        return {"status": "Forbidden", "message": "Access denied - enable Generative AI API in Google Cloud"}
-    elif e.code == 404:
-        return {"status": "Not Found", "message": "Model not found - try different model in Preferences"}
-    elif e.code == 429:
-        return {"status": "Rate Limited", "message": "Too many requests - wait 1 minute and try again"}
-    elif e.code == 500:
-        return {"status": "Server Error", "message": "Google API server error - try again later"}
-    elif e.code == 503:
-        return {"status": "Unavailable", "message": "Service temporarily unavailable"}
-    else:
-        return {"status": f"HTTP {e.code}", "message": msg[:80] or f"HTTP error {e.code}"}
+    if ran or _jobs.take_changed():
+        redraw_view3d()
+    return 0.0 if not _main_queue.empty() else MAIN_QUEUE_INTERVAL
 
 
 # =============================================================================
-# Texture Generation API (Nano Banana Pro)
+# Cancellation (Stop aborts requests already on the wire)
 # =============================================================================
 
-def generate_texture(prompt, size="2K"):
-    global _stop_requested, _texture_path
+class RequestCancelled(Exception):
+    """Raised in a worker whose CancelToken was cancelled."""
+
+
+_worker_local = threading.local()
+
+
+class CancelToken:
+    """Cancellable handle for one piece of background work.
     
-    key = get_key()
-    if not key:
-        raise Exception("No API Key")
+    Connections used under the token are registered while their request is in
+    flight; cancel() shuts those sockets down so blocked reads return at once.
+    """
     
-    if _stop_requested:
-        raise Exception("Stopped")
+    priority = 0  # Rate limiter order (lower goes first)
     
-    set_status("🎨 Generating texture...", f"Creating {size} texture")
+    def __init__(self, parent=None):
+        self.cancelled = False
+        self._conns = set()
+        self._children = weakref.WeakSet()  # Cancelled along with this token
+        self._lock = threading.Lock()
+        if parent is not None:
+            self.priority = parent.priority
+            parent.adopt(self)
     
-    model = "gemini-3-pro-image-preview"
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={key}"
+    def adopt(self, child):
+        with self._lock:
+            if not self.cancelled:
+                self._children.add(child)
+                return
+        child.cancel()
     
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}],
-        "generationConfig": {
-            "responseModalities": ["IMAGE", "TEXT"],
-            "imageConfig": {"aspectRatio": "1:1", "imageSize": size}
-        }
-    }
+    def attach(self, conn):
+        with self._lock:
+            if self.cancelled:
+                raise RequestCancelled("Stopped by user")
+            self._conns.add(conn)
     
+    def detach(self, conn):
+        with self._lock:
+            self._conns.discard(conn)
+    
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            conns, self._conns = self._conns, set()
+            children = list(self._children)
+        for child in children:
+            child.cancel()
+        for conn in conns:
+            sock = conn.sock
+            if sock:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            conn.close()
+
+
+def current_token():
+    """CancelToken of the calling worker thread (None on the main thread)."""
+    return getattr(_worker_local, 'token', None)
+
+
+@contextlib.contextmanager
+def use_token(token):
+    previous = current_token()
+    _worker_local.token = token
     try:
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
-        
-        with urllib.request.urlopen(req, context=ssl.create_default_context(), timeout=120) as resp:
-            result = json.loads(resp.read().decode('utf-8'))
-            
-            if 'candidates' in result and result['candidates']:
-                parts = result['candidates'][0].get('content', {}).get('parts', [])
-                
-                for part in parts:
-                    if 'inlineData' in part:
-                        inline = part['inlineData']
-                        img_data = base64.b64decode(inline['data'])
-                        ext = '.png' if 'png' in inline.get('mimeType', '') else '.jpg'
-                        
-                        temp_dir = tempfile.gettempdir()
-                        filename = f"forge_texture_{hash(prompt) % 10000:04d}{ext}"
-                        filepath = os.path.join(temp_dir, filename)
-                        
-                        with open(filepath, 'wb') as f:
-                            f.write(img_data)
-                        
-                        _texture_path = filepath
-                        set_status("✅ Texture generated", f"Saved: {filename}")
-                        log_action(f"[TEXTURE] Generated: {prompt[:40]}...")
-                        return filepath, None
-                    
-                    elif 'text' in part:
-                        return None, part['text']
-            
-            set_status("⚠️ No image", "API returned no image")
-            return None, "No image generated"
-            
-    except urllib.error.HTTPError as e:
-        body = e.read().decode('utf-8') if e.fp else ""
-        try:
-            msg = json.loads(body).get('error', {}).get('message', '')
-        except:
-            msg = str(e)
-        set_status(f"❌ Texture error", msg[:30])
-        raise Exception(msg[:100])
+        yield token
+    finally:
+        _worker_local.token = previous
 
 
-def generate_texture_set(base_prompt, profile, obj_name="texture"):
-    """Generate complete texture set based on profile maps setting."""
-    maps = profile.get('maps', ['base_color'])
-    size = profile.get('resolution', '2K')
-    texture_set = {}
-    
-    # Anti-text/collage rules
-    RULES = "NO text, NO labels, NO watermarks, NO collage, NO borders. SINGLE image only."
+def is_cancelled():
+    token = current_token()
+    return token is not None and token.cancelled
+
+
+def check_cancelled():
+    if is_cancelled():
+        raise RequestCancelled("Stopped by user")
+
+
+def submit_with_token(executor, fn, *args):
+    """executor.submit that carries the caller's CancelToken into the pool thread."""
+    token = current_token()
+    def run():
+        with use_token(token):
+            return fn(*args)
+    return executor.submit(run)
+
+
+# =============================================================================
+# Job Scheduler (independent jobs on a bounded, prioritized worker pool)
+# =============================================================================
+
+JOB_SLOTS = 4    # Jobs running at once
+JOB_HISTORY = 4  # Finished jobs kept on the panel
+# Lower runs first: interactive requests before background texturing
+JOB_PRIORITY = {'chat': 0, 'profile': 0, 'test': 0, 'texture': 1, 'retier': 1, 'batch': 2}
+JOB_ICONS = {'queued': 'SORTTIME', 'running': 'TIME', 'done': 'CHECKMARK',
+             'failed': 'ERROR', 'cancelled': 'CANCEL'}
+
+
+class Job(CancelToken):
+    """One background task: its token, kind, priority and progress for the panel.
     
-    # Always generate base color
-    set_status("🎨 1/? BaseColor", obj_name)
-    base_prompt_full = f"{base_prompt}, albedo color map, no shadows, even lighting. {RULES}"
-    path, _ = generate_texture(base_prompt_full, size)
-    if path:
-        texture_set['base_color'] = path
-    else:
-        return texture_set  # Can't continue without base
+    fn(job) runs on a scheduler thread; job.cancel() aborts its requests.
+    """
     
-    # Generate roughness if enabled
-    if 'roughness' in maps and not _stop_requested:
-        set_status("🎨 2/? Roughness", obj_name)
-        rough_prompt = f"Roughness map, grayscale, white=rough black=smooth, for {base_prompt}. {RULES}"
-        try:
-            rough_path, _ = generate_texture(rough_prompt, size)
-            if rough_path:
-                texture_set['roughness'] = rough_path
-        except:
-            pass  # Continue without roughness
+    def __init__(self, job_id, kind, label, fn):
+        super().__init__()
+        self.id = job_id
+        self.kind = kind
+        self.label = label
+        self.fn = fn
+        self.priority = JOB_PRIORITY.get(kind, 1)
+        self.state = 'queued'
+        self.progress = None  # 0..1 when known
+        self.detail = ""
     
-    # Generate normal if enabled
-    if 'normal' in maps and not _stop_requested:
-        set_status("🎨 3/? Normal", obj_name)
-        normal_prompt = f"Normal map, purple-blue tangent space, surface bumps, for {base_prompt}. {RULES}"
-        try:
-            normal_path, _ = generate_texture(normal_prompt, size)
-            if normal_path:
-                texture_set['normal'] = normal_path
-        except:
-            pass  # Continue without normal
+    @property
+    def active(self):
+        return self.state in ('queued', 'running')
     
-    # Generate AO if enabled
-    if 'ao' in maps and not _stop_requested:
-        set_status("🎨 4/? AO", obj_name)
-        ao_prompt = f"Ambient occlusion map, grayscale, dark crevices white exposed, for {base_prompt}. {RULES}"
-        try:
-            ao_path, _ = generate_texture(ao_prompt, size)
-            if ao_path:
-                texture_set['ao'] = ao_path
-        except:
-            pass
+    def report(self, progress=None, detail=""):
+        self.progress = progress
+        self.detail = detail
+        _jobs.touch()
     
-    log_action(f"[TEXSET] {len(texture_set)} maps for {obj_name}")
-    return texture_set
+    def summary(self):
+        text = self.label
+        if self.progress is not None and self.active:
+            text += f" {int(self.progress * 100)}%"
+        if self.detail:
+            text += f" · {self.detail}"
+        return text
 
 
-def apply_texture_set_to_object(obj, texture_set, profile=None):
-    """Apply complete texture set with appropriate shader."""
-    if profile is None:
-        try:
-            profile = get_project_profile(bpy.context.scene)
-        except:
-            profile = DEFAULT_PROFILE
+def report_progress(progress=None, detail=""):
+    """Update the calling worker's job (no-op outside a job)."""
+    job = current_token()
+    if isinstance(job, Job):
+        job.report(progress, detail)
+
+
+class JobScheduler:
+    """Runs jobs on up to JOB_SLOTS persistent threads, highest priority first."""
     
-    shading = profile.get('shading', 'pbr')
-    base_path = texture_set.get('base_color')
+    def __init__(self, slots=JOB_SLOTS):
+        self.slots = slots
+        self.jobs = []
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._ids = itertools.count(1)
+        self._threads = []
+        self._lock = threading.Lock()
+        self._changed = False
     
-    if not base_path:
-        return False
+    def submit(self, kind, label, fn):
+        job = Job(next(self._ids), kind, label, fn)
+        with self._lock:
+            self.jobs.append(job)
+            finished = [j for j in self.jobs if not j.active]
+            for old in finished[:-JOB_HISTORY]:
+                self.jobs.remove(old)
+            self._threads = [t for t in self._threads if t.is_alive()]
+            while len(self._threads) < self.slots:
+                thread = threading.Thread(target=self._work, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        self._queue.put((job.priority, next(self._seq), job))
+        self.touch()
+        return job
     
-    # Select shader based on profile
-    if shading == 'toon':
-        mat = create_toon_material(obj, base_path)
-    elif shading == 'unlit':
-        mat = create_unlit_material(obj, base_path)
-    else:  # PBR with full maps
-        rough_path = texture_set.get('roughness')
+    def _work(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            if job.cancelled:
+                continue
+            job.state = 'running'
+            self.touch()
+            try:
+                with use_token(job):
+                    job.fn(job)
+                job.state = 'cancelled' if job.cancelled else 'done'
+            except RequestCancelled:
+                job.state = 'cancelled'
+            except Exception as e:
+                job.state = 'cancelled' if job.cancelled else 'failed'
+                job.detail = str(e)[:40]
+            self.touch()
+    
+    def snapshot(self):
+        with self._lock:
+            return list(self.jobs)
+    
+    def busy(self, kind):
+        return any(job.active and job.kind == kind for job in self.snapshot())
+    
+    def cancel(self, job_id=None):
+        """Cancel one job (or all when job_id is None); returns how many."""
+        targets = [job for job in self.snapshot() if job.active and job_id in (None, job.id)]
+        for job in targets:
+            job.cancel()
+            if job.state == 'queued':
+                job.state = 'cancelled'
+        self.touch()
+        return len(targets)
+    
+    def touch(self):
+        self._changed = True
+    
+    def take_changed(self):
+        """True once after any job change (drives panel redraws)."""
+        changed, self._changed = self._changed, False
+        return changed
+    
+    def shutdown(self):
+        self.cancel()
+        with self._lock:
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put((-1, next(self._seq), None))
+
+
+_jobs = JobScheduler()
+
+
+# =============================================================================
+# HTTP Transport (shared keep-alive connection pool)
+# =============================================================================
+
+API_HOST = os.environ.get("BLENDERFORGE_API_HOST", "https://generativelanguage.googleapis.com")
+_ssl_context = None
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_ssl_context():
+    """Shared SSL context (built once per session)."""
+    global _ssl_context
+    if _ssl_context is None:
+        _ssl_context = ssl.create_default_context()
+    return _ssl_context
+
+
+def api_url(model, method="generateContent", version=None):
+    """Build Gemini endpoint URL for model/method."""
+    if version is None:
+        version = "v1alpha" if "preview" in model else "v1beta"
+    return f"{API_HOST}/{version}/models/{model}:{method}?key={get_key()}"
+
+
+class ConnectionPool:
+    """Idle keep-alive connections to one host, reused across requests."""
+
+    def __init__(self, scheme, host, port, size=4):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.size = size
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout, fresh=False):
+        """Return (connection, reused) - an idle connection if available (and not fresh), else a new one."""
+        with self._lock:
+            conn = self._idle.pop() if self._idle and not fresh else None
+
+        if conn is None:
+            if self.scheme == 'https':
+                conn = http.client.HTTPSConnection(self.host, self.port, timeout=timeout,
+                                                   context=get_ssl_context())
+            else:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+            return conn, False
+
+        conn.timeout = timeout
+        if conn.sock:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def release(self, conn):
+        """Return connection to the pool (closed if the pool is full)."""
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def get_pool(scheme, host, port):
+    """Get (or create) the shared pool for a host."""
+    size = get_pool_size()
+    with _pools_lock:
+        pool = _pools.get((scheme, host, port))
+        if pool is None:
+            pool = _pools[(scheme, host, port)] = ConnectionPool(scheme, host, port, size)
+        pool.size = size
+        return pool
+
+
+def close_pools():
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+class RateLimiter:
+    """Process-wide token bucket in front of every API call.
+    
+    The rate is learned: halved on 429/503 (and paused for Retry-After),
+    raised additively after each success.
+    """
+    
+    def __init__(self, rate=4.0, burst=4, min_rate=0.05, max_rate=20.0):
+        self.rate = rate  # Requests per second
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.waiting = collections.Counter()  # priority -> callers blocked in acquire()
+        self._lock = threading.Lock()
+    
+    def acquire(self, priority=0):
+        """Block until a request may be sent (lower priority values are served first)."""
+        with self._lock:
+            self.waiting[priority] += 1
+        try:
+            while True:
+                with self._lock:
+                    now = time.monotonic()
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    wait = self.blocked_until - now
+                    if wait <= 0:
+                        ahead = any(n for p, n in self.waiting.items() if p < priority)
+                        if self.tokens >= 1 and not ahead:
+                            self.tokens -= 1
+                            return
+                        wait = 0.05 if ahead else (1 - self.tokens) / self.rate
+                check_cancelled()
+                time.sleep(min(wait, 0.5))
+        finally:
+            with self._lock:
+                self.waiting[priority] -= 1
+    
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 0.1)
+    
+    def on_throttle(self, retry_after=None):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * 0.5)
+            self.tokens = 0.0
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+
+_rate_limiter = RateLimiter()
+RETRY_STATUS = (429, 503)
+MAX_RETRIES = 5
+
+
+def parse_retry_after(headers, body):
+    """Seconds to wait from a Retry-After header or a google.rpc.RetryInfo body (or None)."""
+    value = headers.get('Retry-After') if headers else None
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    m = re.search(rb'"retryDelay"\s*:\s*"([\d.]+)s"', body or b"")
+    return float(m.group(1)) if m else None
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Jittered exponential backoff (never shorter than the server asked for)."""
+    delay = min(60.0, 2 ** attempt) * random.uniform(0.5, 1.5)
+    return max(delay, retry_after or 0.0)
+
+
+def _send_request(pool, path, body, headers, timeout, token=None):
+    """Send on a pooled connection; retries on a new one if a reused keep-alive socket was stale.
+    
+    A stale socket means the server timed out the idle ones, so the rest of the
+    pool is dropped too. The connection stays attached to token until api_open
+    is done with it.
+    """
+    for attempt in range(2):
+        conn, reused = pool.acquire(timeout, fresh=attempt > 0)
+        if token:
+            try:
+                token.attach(conn)
+            except RequestCancelled:
+                pool.release(conn)
+                raise
+        try:
+            conn.request('POST', path, body=body, headers=headers)
+            return conn, conn.getresponse()
+        except (http.client.HTTPException, OSError) as e:
+            if token:
+                token.detach(conn)
+            conn.close()
+            if token and token.cancelled:
+                raise RequestCancelled("Stopped by user")
+            if reused and attempt == 0:
+                pool.close()  # Server dropped the idle sockets - retry on a fresh one
+                continue
+            raise urllib.error.URLError(e)
+
+
+@contextlib.contextmanager
+def api_open(url, payload, timeout=60):
+    """POST JSON payload over a pooled connection and yield the open response.
+    
+    Goes through the shared rate limiter; 429/503 are retried with backoff.
+    Raises urllib.error.HTTPError / URLError like urlopen so callers keep their error handling,
+    and RequestCancelled once the calling worker's CancelToken is cancelled.
+    """
+    parts = urllib.parse.urlsplit(url)
+    pool = get_pool(parts.scheme, parts.hostname, parts.port)
+    path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+    body = json.dumps(payload).encode('utf-8')
+    headers = {'Content-Type': 'application/json', 'Connection': 'keep-alive'}
+
+    token = current_token()
+    for attempt in range(MAX_RETRIES + 1):
+        _rate_limiter.acquire(token.priority if token else 0)
+        conn, resp = _send_request(pool, path, body, headers, timeout, token)
+        if resp.status < 400:
+            _rate_limiter.on_success()
+            break
+        
+        data = resp.read()
+        if token:
+            token.detach(conn)
+        if resp.will_close:
+            conn.close()
+        else:
+            pool.release(conn)
+        
+        if resp.status not in RETRY_STATUS or attempt == MAX_RETRIES:
+            raise urllib.error.HTTPError(url, resp.status, resp.reason, resp.headers, io.BytesIO(data))
+        
+        retry_after = parse_retry_after(resp.headers, data)
+        _rate_limiter.on_throttle(retry_after)
+        delay = backoff_delay(attempt, retry_after)
+        set_status(f"⏳ Rate limited, retry {attempt + 1}/{MAX_RETRIES}", f"Waiting {delay:.0f}s")
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline:
+            check_cancelled()
+            time.sleep(min(0.25, deadline - time.monotonic()))
+
+    reusable = False
+    try:
+        yield resp
+        # A shut-down socket reads as a clean EOF - don't hand back a truncated body
+        if token and token.cancelled:
+            raise RequestCancelled("Stopped by user")
+        reusable = resp.isclosed() and not resp.will_close
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        if token and token.cancelled:
+            raise RequestCancelled("Stopped by user") from e
+        raise
+    finally:
+        if token:
+            token.detach(conn)
+        if reusable:
+            pool.release(conn)
+        else:
+            conn.close()
+
+
+def api_post(url, payload, timeout=60):
+    """POST JSON payload and return the parsed JSON reply."""
+    with api_open(url, payload, timeout) as resp:
+        return json.loads(resp.read().decode('utf-8'))
+
+
+# =============================================================================
+# Server-Side Context Cache (static system prompt registered once)
+# =============================================================================
+
+CONTEXT_CACHE_TTL = 3600     # Seconds a cached context lives on the server
+CONTEXT_CACHE_MARGIN = 60    # Recreate this long before expiry
+CONTEXT_CACHE_RETRY = 600    # After a failed create, send inline for this long
+CONTEXT_CACHE_MIN_TOKENS = 1024      # API minimum for a cached context (Flash models)
+CONTEXT_CACHE_MIN_TOKENS_PRO = 4096  # Same for Pro models
+
+
+class ContextCache:
+    """Local bookkeeping of cachedContents handles per (model, instruction text).
+    
+    Texts below the API's minimum token count are never submitted; other
+    failures (e.g. unsupported models) are remembered for CONTEXT_CACHE_RETRY.
+    Either way callers get None and send the instruction inline.
+    """
+    
+    def __init__(self):
+        self.entries = {}     # key -> (name, expires_at)
+        self.failed = {}      # key -> retry_at
+        self.pending = set()  # keys being created in the background
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def key(model, text):
+        return model, hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def min_tokens(model):
+        return CONTEXT_CACHE_MIN_TOKENS_PRO if "pro" in model else CONTEXT_CACHE_MIN_TOKENS
+    
+    @staticmethod
+    def eligible(model, text):
+        """Whether text is large enough for the API to cache it on model."""
+        return estimate_tokens(text) >= ContextCache.min_tokens(model)
+    
+    def get(self, model, text):
+        """Handle name for text on model, or None to fall back inline.
+        
+        Never blocks the request: a missing or expiring handle is created in a
+        background thread and used from the next request on.
+        """
+        if not self.eligible(model, text):
+            return None
+        key = self.key(model, text)
+        now = time.time()
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] - CONTEXT_CACHE_MARGIN > now:
+                return entry[0]
+            if self.failed.get(key, 0) > now or key in self.pending:
+                return None
+            self.pending.add(key)
+        threading.Thread(target=self._create, args=(key, model, text), daemon=True).start()
+        return None
+    
+    def _create(self, key, model, text):
+        now = time.time()
+        version = "v1alpha" if "preview" in model else "v1beta"
+        payload = {
+            "model": f"models/{model}",
+            "systemInstruction": {"parts": [{"text": text}]},
+            "ttl": f"{CONTEXT_CACHE_TTL}s",
+        }
+        try:
+            result = api_post(f"{API_HOST}/{version}/cachedContents?key={get_key()}", payload, timeout=30)
+            name = result["name"]
+        except Exception as e:
+            with self._lock:
+                self.failed[key] = now + CONTEXT_CACHE_RETRY
+                self.pending.discard(key)
+            log_action(f"[CACHE] Context cache unavailable, inline: {str(e)[:30]}")
+            return
+        
+        with self._lock:
+            self.entries[key] = (name, now + CONTEXT_CACHE_TTL)
+            self.pending.discard(key)
+        log_action(f"[CACHE] System prompt cached: {name[-12:]}")
+    
+    def invalidate(self, model, text):
+        with self._lock:
+            self.entries.pop(self.key(model, text), None)
+
+
+_context_cache = ContextCache()
+
+
+# =============================================================================
+# Request Hedging (duplicate a slow request, keep the first answer)
+# =============================================================================
+
+LATENCY_WINDOW = 50    # Recent samples kept per (model, endpoint)
+LATENCY_MIN_SAMPLES = 5
+HEDGE_MIN_DELAY = 0.5  # Never duplicate a request sooner than this
+
+
+class LatencyStats:
+    """Recent time-to-answer samples per (model, endpoint)."""
+    
+    def __init__(self, window=LATENCY_WINDOW):
+        self.window = window
+        self.samples = {}
+        self._lock = threading.Lock()
+    
+    def record(self, key, seconds):
+        with self._lock:
+            samples = self.samples.get(key)
+            if samples is None:
+                samples = self.samples[key] = collections.deque(maxlen=self.window)
+            samples.append(seconds)
+    
+    def percentile(self, key, q):
+        """q-th percentile in seconds (None until LATENCY_MIN_SAMPLES were seen)."""
+        with self._lock:
+            samples = sorted(self.samples.get(key, ()))
+        if len(samples) < LATENCY_MIN_SAMPLES:
+            return None
+        return samples[min(len(samples) - 1, int(q / 100 * len(samples)))]
+
+
+class HedgeBudget:
+    """Sliding one-minute cap on duplicate requests."""
+    
+    def __init__(self, per_minute=get_hedge_budget):
+        self.per_minute = per_minute
+        self.sent = collections.deque()
+        self._lock = threading.Lock()
+    
+    def take(self):
+        now = time.monotonic()
+        with self._lock:
+            while self.sent and now - self.sent[0] > 60:
+                self.sent.popleft()
+            if len(self.sent) >= self.per_minute():
+                return False
+            self.sent.append(now)
+            return True
+
+
+_latency = LatencyStats()
+_hedge_budget = HedgeBudget()
+
+
+def run_hedged(attempt, key):
+    """Run attempt(claim); past the p90 latency of key, race a second copy of it.
+    
+    An attempt calls claim() once it has an answer (first streamed text or the full
+    reply): the first caller wins and the other attempt is cancelled, a late caller
+    gets RequestCancelled. Each attempt runs under its own child of the caller's token.
+    """
+    delay = _latency.percentile(key, 90)
+    if delay is not None:
+        delay = max(delay, HEDGE_MIN_DELAY)
+    parent = current_token()
+    lock = threading.Lock()
+    state = {"winner": None}
+    attempts = {}  # future -> token
+    
+    def run(token):
+        def claim():
+            with lock:
+                if state["winner"] is None:
+                    state["winner"] = token
+                losers = [t for t in attempts.values() if t is not state["winner"]]
+            if state["winner"] is not token:
+                raise RequestCancelled("Lost hedge")
+            for other in losers:
+                other.cancel()
+        with use_token(token):
+            return attempt(claim)
+    
+    def launch():
+        token = CancelToken(parent)
+        attempts[executor.submit(run, token)] = token
+    
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+    try:
+        with lock:
+            launch()
+        done, _ = concurrent.futures.wait(list(attempts), timeout=delay)
+        if not done and _hedge_budget.take():
+            with lock:
+                if state["winner"] is None:
+                    launch()
+                    log_action(f"[HEDGE] No answer after {delay:.1f}s, sent duplicate")
+        
+        error = None
+        for future in concurrent.futures.as_completed(list(attempts)):
+            try:
+                return future.result()
+            except RequestCancelled as e:
+                error = error or e
+            except Exception as e:
+                if state["winner"] is attempts[future]:
+                    raise
+                error = e
+        raise error
+    finally:
+        for token in attempts.values():
+            token.cancel()
+        executor.shutdown(wait=False)
+
+
+# =============================================================================
+# Code Generation API
+# =============================================================================
+
+STREAM_UI_INTERVAL = 0.1  # Seconds between partial-text pushes (~UI redraw rate)
+
+
+def candidate_text(result):
+    """Text of the first candidate (None if absent); raises on safety blocks."""
+    # Check for safety blocks
+    if 'promptFeedback' in result:
+        block = result['promptFeedback'].get('blockReason')
+        if block:
+            log_action(f"[ERROR] Content blocked: {block}")
+            raise Exception(f"Content blocked: {block}")
+    
+    if 'candidates' in result and result['candidates']:
+        candidate = result['candidates'][0]
+        
+        # Check finish reason
+        finish = candidate.get('finishReason', '')
+        if finish == 'SAFETY':
+            log_action("[ERROR] Response blocked by safety filter")
+            raise Exception("Response blocked by safety filter")
+        
+        return candidate.get('content', {}).get('parts', [{}])[0].get('text', '')
+    return None
+
+
+def read_sse_events(resp):
+    """Yield parsed JSON payloads of a server-sent-events response."""
+    data = []
+    for raw in resp:
+        line = raw.decode('utf-8').rstrip('\r\n')
+        if line.startswith('data:'):
+            data.append(line[5:].lstrip())
+        elif not line and data:
+            yield json.loads("\n".join(data))
+            data = []
+    if data:
+        yield json.loads("\n".join(data))
+
+
+def call_api(messages, system=None, on_text=None, use_cache=True):
+    """Send chat to Gemini and return reply text.
+    
+    With on_text and streaming enabled, the reply is read from the SSE endpoint and
+    on_text(text_so_far) is called at most every STREAM_UI_INTERVAL.
+    With the context cache enabled, system is sent by cachedContents handle.
+    With hedging enabled, a slow request is raced against a duplicate (run_hedged).
+    """
+    global _status, _model_info
+    
+    key = get_key()
+    if not key:
+        log_action("[ERROR] No API key configured")
+        raise Exception("No API Key - Set it in Preferences")
+    
+    check_cancelled()
+    
+    model = get_model()
+    _model_info = model_name()
+    set_status(f"🔄 {_model_info} thinking...", "Sending request")
+    
+    stream = on_text is not None and is_streaming()
+    method = "streamGenerateContent" if stream else "generateContent"
+    url = api_url(model, method) + "&alt=sse" if stream else api_url(model)
+    
+    payload = {"contents": messages, "generationConfig": {"temperature": 0.7, "maxOutputTokens": 8192}}
+    cache_name = _context_cache.get(model, system) if system and use_cache and is_context_cache() else None
+    if cache_name:
+        payload["cachedContent"] = cache_name
+    elif system:
+        payload["systemInstruction"] = {"parts": [{"text": system}]}
+    
+    def attempt(claim):
+        started = time.monotonic()
+        with api_open(url, payload, timeout=90) as resp:
+            if not stream:
+                result = json.loads(resp.read().decode('utf-8'))
+                claim()
+                _latency.record((model, method), time.monotonic() - started)
+                return candidate_text(result)
+            
+            chunks = []
+            last_push = 0.0
+            for event in read_sse_events(resp):
+                check_cancelled()
+                piece = candidate_text(event)
+                if piece:
+                    if not chunks:
+                        claim()
+                        _latency.record((model, method), time.monotonic() - started)
+                        set_status(f"🔄 {_model_info} streaming...", "Receiving response")
+                    chunks.append(piece)
+                if chunks and time.monotonic() - last_push >= STREAM_UI_INTERVAL:
+                    on_text("".join(chunks))
+                    last_push = time.monotonic()
+            text = "".join(chunks) if chunks else None
+            if text:
+                on_text(text)
+            return text
+    
+    try:
+        set_status(f"🔄 {_model_info} generating...", "Waiting for response")
+        
+        if is_hedging():
+            text = run_hedged(attempt, (model, method))
+        else:
+            text = attempt(lambda: None)
+        
+        if text is None:
+            log_action("[ERROR] Empty response from API")
+            set_status(f"⚠️ Empty response", "No content")
+            return ""
+        
+        set_status(f"✅ {_model_info} done", "Response received")
+        return text
+            
+    except urllib.error.HTTPError as e:
+        if cache_name and e.code in (400, 403, 404):
+            # Handle expired or deleted server-side - resend inline once
+            _context_cache.invalidate(model, system)
+            return call_api(messages, system, on_text, use_cache=False)
+        
+        error_details = parse_api_error(e)
+        log_action(f"[ERROR] HTTP {e.code}: {error_details['message']}")
+        set_status(f"❌ {error_details['status']}", error_details['message'][:30])
+        raise Exception(error_details['message'])
+    
+    except urllib.error.URLError as e:
+        log_action(f"[ERROR] Network: {str(e.reason)}")
+        set_status("❌ Network Error", str(e.reason)[:30])
+        raise Exception(f"Network error: {e.reason}")
+    
+    except json.JSONDecodeError as e:
+        log_action(f"[ERROR] Invalid JSON response")
+        set_status("❌ Parse Error", "Invalid response")
+        raise Exception("Invalid API response format")
+
+
+def parse_api_error(e):
+    """Parse HTTP error into detailed info."""
+    try:
+        body = e.read().decode('utf-8') if e.fp else ""
+        error_json = json.loads(body) if body else {}
+        msg = error_json.get('error', {}).get('message', '')
+        code = error_json.get('error', {}).get('code', e.code)
+    except:
+        msg = ""
+        code = e.code
+    
+    # Human-readable error messages
+    if e.code == 400:
+        if 'API_KEY' in msg.upper() or 'key' in msg.lower():
+            return {"status": "Invalid Key", "message": "API key is invalid - get new one at aistudio.google.com"}
+        elif 'model' in msg.lower():
+            return {"status": "Model Error", "message": f"Model not available: {msg[:50]}"}
+        else:
+            return {"status": f"Bad Request", "message": msg[:80] or "Invalid request"}
+    elif e.code == 401:
+        return {"status": "Unauthorized", "message": "API key unauthorized - check permissions"}
+    elif e.code == 403:
+        return {"status": "Forbidden", "message": "Access denied - enable Generative AI API in Google Cloud"}
+    elif e.code == 404:
+        return {"status": "Not Found", "message": "Model not found - try different model in Preferences"}
+    elif e.code == 429:
+        return {"status": "Rate Limited", "message": f"Quota still exhausted after {MAX_RETRIES} retries - try again later"}
+    elif e.code == 500:
+        return {"status": "Server Error", "message": "Google API server error - try again later"}
+    elif e.code == 503:
+        return {"status": "Unavailable", "message": "Service temporarily unavailable"}
+    else:
+        return {"status": f"HTTP {e.code}", "message": msg[:80] or f"HTTP error {e.code}"}
+
+
+# =============================================================================
+# Disk Cache (content-addressed, persists across sessions)
+# =============================================================================
+
+class DiskCache:
+    """Files named by a stable digest in one folder, LRU-evicted to a size budget."""
+    
+    def __init__(self, kind, budget=get_cache_budget):
+        self.kind = kind
+        self.budget = budget
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def digest(*parts):
+        """Stable key (unlike hash(), identical across sessions)."""
+        return hashlib.sha256(json.dumps(parts).encode('utf-8')).hexdigest()
+    
+    @property
+    def folder(self):
+        path = os.path.join(get_cache_root(), self.kind)
+        os.makedirs(path, exist_ok=True)
+        return path
+    
+    def lookup(self, digest, exts):
+        """Return cached path for digest (and mark it recently used) or None."""
+        folder = self.folder
+        for ext in exts:
+            path = os.path.join(folder, digest + ext)
+            if os.path.exists(path):
+                try:
+                    os.utime(path)  # mtime = last use
+                except OSError:
+                    pass
+                return path
+        return None
+    
+    def temp_path(self, digest):
+        """Scratch file for writing an entry incrementally (see commit)."""
+        return os.path.join(self.folder, f"{digest}.{threading.get_ident()}.part")
+    
+    def commit(self, tmp, digest, ext):
+        """Atomically move a finished scratch file into place and enforce the budget."""
+        path = os.path.join(self.folder, digest + ext)
+        os.replace(tmp, path)
+        self.evict(keep=path)
+        return path
+    
+    def store(self, digest, data, ext):
+        """Write data atomically under digest and enforce the budget."""
+        tmp = self.temp_path(digest)
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        return self.commit(tmp, digest, ext)
+    
+    def evict(self, keep=None):
+        """Delete least recently used files until under budget."""
+        budget = self.budget()
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.folder):
+                if entry.is_file() and not entry.name.endswith('.part'):
+                    st = entry.stat()
+                    entries.append((st.st_mtime, st.st_size, entry.path))
+            total = sum(e[1] for e in entries)
+            for mtime, size, path in sorted(entries):
+                if total <= budget:
+                    break
+                if path == keep:
+                    continue
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+    
+    def clear(self):
+        with self._lock:
+            for entry in os.scandir(self.folder):
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
+
+
+IMAGE_EXTS = ('.png', '.jpg')
+_texture_cache = DiskCache("textures")
+_inflight = {}  # digest -> Future of the request currently generating it
+_inflight_lock = threading.Lock()
+
+
+# =============================================================================
+# Response Cache (opt-in Code AI memoization)
+# =============================================================================
+
+RESPONSE_CACHE_BUDGET = 32 * 1024 * 1024
+_response_cache = DiskCache("responses", budget=lambda: RESPONSE_CACHE_BUDGET)
+_response_cache_hit = False  # Last reply shown came from the cache
+
+
+def normalize_message(msg):
+    """Case/whitespace-insensitive form of a request."""
+    return " ".join(msg.lower().split()).rstrip(".!? ")
+
+
+def response_cache_key(model, msg, scene_digest):
+    """Digest of (model, normalized message, system prompt, scene).
+    
+    The system hash covers the static rules and project description, not the
+    ever-changing recent-actions log.
+    """
+    try:
+        desc = bpy.context.scene.forge_project_desc
+    except:
+        desc = ""
+    system_hash = hashlib.sha256((get_system(project=False) + desc).encode('utf-8')).hexdigest()
+    return DiskCache.digest(model, normalize_message(msg), system_hash, scene_digest)
+
+
+def get_cached_response(digest):
+    """Stored {"response", "code"} for digest or None."""
+    path = _response_cache.lookup(digest, ('.json',))
+    if not path:
+        return None
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except:
+        return None
+
+
+def store_response(digest, response, code):
+    try:
+        data = json.dumps({"response": response, "code": code or ""}).encode('utf-8')
+        _response_cache.store(digest, data, '.json')
+    except OSError:
+        pass
+
+
+# =============================================================================
+# Texture Generation API (Nano Banana Pro)
+# =============================================================================
+
+def generate_texture(prompt, size="2K", map_type="base_color"):
+    global _texture_path
+    
+    check_cancelled()
+    
+    size = generation_size(size)  # Lower tiers are derived locally (see texture_tier)
+    model = "gemini-3-pro-image-preview"
+    digest = DiskCache.digest(model, prompt, size, map_type)
+    
+    # Cache hit: no API call
+    cached = _texture_cache.lookup(digest, IMAGE_EXTS)
+    if cached:
+        _texture_path = cached
+        set_status("✅ Texture (cached)", f"Reused: {digest[:12]}")
+        log_action(f"[TEXTURE] Cached: {prompt[:40]}...")
+        return cached, None
+    
+    key = get_key()
+    if not key:
+        raise Exception("No API Key")
+    
+    # Coalesce: identical requests already in flight share one API call
+    while True:
+        with _inflight_lock:
+            future = _inflight.get(digest)
+            owner = future is None
+            if owner:
+                future = _inflight[digest] = concurrent.futures.Future()
+        if owner:
+            break
+        
+        set_status("🎨 Waiting for identical texture...", f"Shared: {digest[:12]}")
+        try:
+            while True:
+                try:
+                    return future.result(timeout=0.25)
+                except concurrent.futures.TimeoutError:
+                    check_cancelled()
+        except RequestCancelled:
+            # The owner's job was stopped, not ours - take over the request
+            check_cancelled()
+    
+    try:
+        # Finished between our cache miss and registering?
+        result = (_texture_cache.lookup(digest, IMAGE_EXTS), None)
+        if not result[0]:
+            result = request_texture(model, prompt, size, digest)
+    except BaseException as e:
+        # Unregister first so waiters that take over start a new request
+        with _inflight_lock:
+            _inflight.pop(digest, None)
+        future.set_exception(e)
+        raise
+    with _inflight_lock:
+        _inflight.pop(digest, None)
+    future.set_result(result)
+    return result
+
+
+_DATA_FIELD = re.compile(rb'"data"\s*:\s*"')
+
+
+def stream_inline_data(resp, out, chunk_size=256 * 1024):
+    """Copy the base64 inlineData.data of a JSON response into out, decoded.
+    
+    Reads resp in chunks and decodes as it goes, so memory stays flat regardless of
+    image size. Returns (skeleton, written): the response JSON with every data string
+    emptied (small enough to json.loads) and the number of image bytes written.
+    Only the first image is kept; later ones are dropped.
+    """
+    skeleton = []
+    pending = b""
+    carry = b""
+    in_data = False
+    images = 0
+    written = 0
+    
+    while True:
+        chunk = resp.read(chunk_size)
+        pending += chunk
+        
+        while pending:
+            if in_data:
+                end = pending.find(b'"')
+                payload = pending if end < 0 else pending[:end]
+                if images == 1:
+                    payload = carry + payload.replace(b'\\', b'')  # JSON may escape '/' as '\/'
+                    usable = len(payload) - len(payload) % 4
+                    if usable:
+                        decoded = binascii.a2b_base64(payload[:usable])
+                        out.write(decoded)
+                        written += len(decoded)
+                    carry = payload[usable:]
+                if end < 0:
+                    pending = b""
+                    break
+                skeleton.append(b'"')
+                pending = pending[end + 1:]
+                in_data = False
+            else:
+                m = _DATA_FIELD.search(pending)
+                if m is None:
+                    # Keep a short tail in case the field name is split across chunks
+                    keep = 0 if not chunk else min(16, len(pending))
+                    skeleton.append(pending[:len(pending) - keep])
+                    pending = pending[len(pending) - keep:]
+                    break
+                skeleton.append(pending[:m.end()])
+                pending = pending[m.end():]
+                in_data = True
+                images += 1
+        
+        if not chunk:
+            break
+    
+    if carry:
+        decoded = binascii.a2b_base64(carry + b"=" * (-len(carry) % 4))
+        out.write(decoded)
+        written += len(decoded)
+    return b"".join(skeleton), written
+
+
+def request_texture(model, prompt, size, digest):
+    """Single image generation call; stores the result in the texture cache."""
+    global _texture_path
+    
+    set_status("🎨 Generating texture...", f"Creating {size} texture")
+    
+    url = api_url(model, version="v1beta")
+    
+    payload = {
+        "contents": [{"parts": [{"text": prompt}]}],
+        "generationConfig": {
+            "responseModalities": ["IMAGE", "TEXT"],
+            "imageConfig": {"aspectRatio": "1:1", "imageSize": size}
+        }
+    }
+    
+    tmp = _texture_cache.temp_path(digest)
+    try:
+        # Decode image straight into the cache file (no full-body copies in memory)
+        with api_open(url, payload, timeout=120) as resp, open(tmp, 'wb') as out:
+            skeleton, written = stream_inline_data(resp, out)
+        result = json.loads(skeleton.decode('utf-8'))
+        
+        if 'candidates' in result and result['candidates']:
+            parts = result['candidates'][0].get('content', {}).get('parts', [])
+            
+            for part in parts:
+                if 'inlineData' in part and written:
+                    inline = part['inlineData']
+                    ext = '.png' if 'png' in inline.get('mimeType', '') else '.jpg'
+                    
+                    filepath = _texture_cache.commit(tmp, digest, ext)
+                    
+                    _texture_path = filepath
+                    set_status("✅ Texture generated", f"Saved: {digest[:12]}{ext}")
+                    log_action(f"[TEXTURE] Generated: {prompt[:40]}...")
+                    return filepath, None
+                
+                elif 'text' in part and not written:
+                    return None, part['text']
+        
+        set_status("⚠️ No image", "API returned no image")
+        return None, "No image generated"
+        
+    except urllib.error.HTTPError as e:
+        body = e.read().decode('utf-8') if e.fp else ""
+        try:
+            msg = json.loads(body).get('error', {}).get('message', '')
+        except:
+            msg = str(e)
+        set_status(f"❌ Texture error", msg[:30])
+        raise Exception(msg[:100])
+    
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def get_texture_map_prompts(base_prompt, maps):
+    """Build per-map prompts (base color always included)."""
+    # Anti-text/collage rules
+    RULES = "NO text, NO labels, NO watermarks, NO collage, NO borders. SINGLE image only."
+    
+    prompts = {'base_color': f"{base_prompt}, albedo color map, no shadows, even lighting. {RULES}"}
+    if 'roughness' in maps:
+        prompts['roughness'] = f"Roughness map, grayscale, white=rough black=smooth, for {base_prompt}. {RULES}"
+    if 'normal' in maps:
+        prompts['normal'] = f"Normal map, purple-blue tangent space, surface bumps, for {base_prompt}. {RULES}"
+    if 'ao' in maps:
+        prompts['ao'] = f"Ambient occlusion map, grayscale, dark crevices white exposed, for {base_prompt}. {RULES}"
+    return prompts
+
+
+MAP_LABELS = {'base_color': "BaseColor", 'roughness': "Roughness", 'normal': "Normal", 'ao': "AO", 'orm': "ORM"}
+
+
+def generate_texture_set(base_prompt, profile, obj_name="texture", on_map=None):
+    """Generate complete texture set based on profile maps setting.
+    
+    Maps are requested concurrently (derived maps only depend on the prompt).
+    on_map(map_type, texture_set) is called from the worker thread for each
+    finished map once the base color is available.
+    With local derivation on (PBR only), just the base color is requested and
+    the other maps are derived from it here, off the main thread.
+    """
+    maps = profile.get('maps', ['base_color']) if not is_derive_maps() else ['base_color']
+    size = profile.get('resolution', '2K')
+    tier = target_tier(profile)
+    prompts = get_texture_map_prompts(base_prompt, maps)
+    texture_set = {}
+    total = len(prompts)
+    
+    set_status(f"🎨 0/{total} maps", obj_name)
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(total, get_max_workers()))
+    futures = {submit_with_token(executor, generate_texture, prompt, size, map_type): map_type
+               for map_type, prompt in prompts.items()}
+    
+    try:
+        for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+            map_type = futures[future]
+            try:
+                path, _ = future.result()
+            except Exception:
+                if map_type == 'base_color':
+                    raise
+                path = None  # Continue without this map
+            
+            if map_type == 'base_color' and not path:
+                return {}  # Can't continue without base
+            
+            if path:
+                texture_tier(path, tier, map_type == 'normal')
+                texture_set[map_type] = path
+                set_status(f"🎨 {done}/{total} {MAP_LABELS[map_type]}", obj_name)
+                if on_map and 'base_color' in texture_set:
+                    on_map(map_type, dict(texture_set))
+            
+            if is_cancelled():
+                break
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    base_path = texture_set.get('base_color')
+    pbr = base_path and profile.get('shading', 'pbr') == 'pbr'
+    if pbr and is_derive_maps() and not is_cancelled():
+        missing = [m for m in DERIVED_MAPS if m in profile.get('maps', []) and m not in texture_set]
+        for map_type, path in derive_pbr_maps(base_path, missing).items():
+            texture_tier(path, tier, map_type == 'normal')
+            texture_set[map_type] = path
+            if on_map:
+                on_map(map_type, dict(texture_set))
+    
+    ao_path, rough_path = texture_set.get('ao'), texture_set.get('roughness')
+    if pbr and is_pack_orm() and (ao_path or rough_path) and not is_cancelled():
+        orm_path = pack_orm_map(ao_path, rough_path)
+        if orm_path:
+            texture_tier(orm_path, tier)
+            texture_set['orm'] = orm_path
+    
+    log_action(f"[TEXSET] {len(texture_set)} maps for {obj_name}")
+    return texture_set
+
+
+def apply_texture_set_to_object(obj, texture_set, profile=None, partial=False):
+    """Apply texture set with appropriate shader.
+    
+    partial: more maps are on the way - use the object's preview material
+    instead of creating a shared instance for every intermediate set.
+    """
+    if profile is None:
+        try:
+            profile = get_project_profile(bpy.context.scene)
+        except:
+            profile = DEFAULT_PROFILE
+    
+    shading = profile.get('shading', 'pbr')
+    base_path = texture_set.get('base_color')
+    
+    if not base_path:
+        return False
+    
+    # Select shader based on profile
+    if shading in ('toon', 'unlit'):
+        variant, images = (shading,), {'Base Color': base_path}
+    else:  # PBR with full maps
+        rough_path = texture_set.get('roughness')
         normal_path = texture_set.get('normal')
-        mat = create_pbr_material(obj, base_path, rough_path, normal_path)
+        ao_path = texture_set.get('ao')
+        orm_path = texture_set.get('orm') if is_pack_orm() else None
+        if orm_path:
+            variant, images = pbr_inputs(base_path, normal_path=normal_path, orm_path=orm_path)
+        else:
+            variant, images = pbr_inputs(base_path, rough_path, normal_path, ao_path)
+    mat = preview_material(obj, variant, images) if partial else instance_material(variant, images)
     
-    # Apply material
+    # Apply material (a replaced preview material has no other users)
+    old = obj.data.materials[0] if obj.data.materials else None
     if obj.data.materials:
         obj.data.materials[0] = mat
     else:
         obj.data.materials.append(mat)
+        _panel_state.invalidate('meshes')
+    if old and old != mat and "forge_preview" in old and not old.users:
+        bpy.data.materials.remove(old)
     
     map_count = len(texture_set)
     log_action(f"[SHADER] {shading.upper()} ({map_count} maps) → {obj.name}")
     return True
 
 
-def apply_smart_uv(obj):
-    """Auto-unwrap UVs based on object type."""
-    try:
-        if obj.type != 'MESH': return
-        
-        # Geometry analysis
-        bbox = obj.dimensions
-        is_flat = min(bbox) < max(bbox) * 0.1
-        is_surface = any(x in obj.name.lower() for x in ['wall', 'floor', 'ground', 'terrain', 'ceiling'])
+# =============================================================================
+# UV Unwrapping (projection chosen from face normals, not names)
+# =============================================================================
+
+UV_ALIGNED = 0.95       # |normal . axis| for a face to count as axis-aligned (~18°)
+UV_PLANAR = 0.9         # Share of normal energy along one direction for planar
+UV_CUBE = 0.8           # Share of area facing a local axis for cube
+UV_SIDE = 0.2           # |normal . axis| below which a face is a cylinder side
+UV_CYLINDER = 0.5       # Share of area on cylinder sides
+UV_ANGLE_BINS = 12      # Histogram of side-normal directions around the axis
+UV_ANGLE_MIN_BINS = 6   # Occupied bins needed (a box side only fills 4)
+UV_LABELS = {'planar': "Planar", 'cube': "Cube", 'cylinder': "Cylinder", 'smart': "Smart Project"}
+
+
+def polygon_loops(mesh):
+    """(loop_start, loop_total) per polygon in loop order, for reduceat / repeat."""
+    starts = np.empty(len(mesh.polygons), dtype=np.int32)
+    totals = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get('loop_start', starts)
+    mesh.polygons.foreach_get('loop_total', totals)
+    order = np.argsort(starts)
+    return starts[order], totals[order], order
+
+
+def face_data(mesh):
+    """Polygon normals (n, 3) and areas (n,) in local space, read in bulk."""
+    count = len(mesh.polygons)
+    normals = np.empty(count * 3, dtype=np.float32)
+    areas = np.empty(count, dtype=np.float32)
+    mesh.polygons.foreach_get('normal', normals)
+    mesh.polygons.foreach_get('area', areas)
+    return normals.reshape(-1, 3), areas
+
+
+def plane_basis(axis):
+    """Two unit vectors spanning the plane perpendicular to axis."""
+    helper = np.eye(3)[np.argmin(np.abs(axis))]
+    t1 = np.cross(axis, helper)
+    t1 /= np.linalg.norm(t1)
+    return t1, np.cross(axis, t1)
+
+
+def classify_uv(normals, areas):
+    """Pick a projection from area-weighted face normals: (method, axis or None).
+    
+    planar   - almost all normal energy along one direction (floors, walls, panels)
+    cube     - most area faces a local axis (crates, buildings)
+    cylinder - most area faces sideways around one axis, spread around the circle
+    smart    - everything else (organic / irregular props)
+    """
+    total = float(areas.sum())
+    if not len(areas) or total <= 0:
+        return 'smart', None
+    w = areas / total
+    
+    # Planarity: largest eigenvalue of sum(w * n n^T) is 1 when all faces are (anti)parallel
+    energy = (normals * w[:, None]).T @ normals
+    values, vectors = np.linalg.eigh(energy)
+    if values[2] >= UV_PLANAR:
+        return 'planar', vectors[:, 2]
+    
+    if w[np.abs(normals).max(axis=1) >= UV_ALIGNED].sum() >= UV_CUBE:
+        return 'cube', None
+    
+    # The cylinder axis is one of the principal directions (which depends on the cap area)
+    for axis in vectors.T:
+        side = np.abs(normals @ axis) < UV_SIDE
+        share = w[side].sum()
+        if share < UV_CYLINDER:
+            continue
+        t1, t2 = plane_basis(axis)
+        angle = np.arctan2(normals[side] @ t2, normals[side] @ t1)
+        bins = ((angle + np.pi) / (2 * np.pi) * UV_ANGLE_BINS).astype(np.int32) % UV_ANGLE_BINS
+        hist = np.bincount(bins, weights=w[side], minlength=UV_ANGLE_BINS)
+        if (hist >= share / UV_ANGLE_BINS / 4).sum() >= UV_ANGLE_MIN_BINS:
+            return 'cylinder', axis
+    return 'smart', None
+
+
+def project_uvs(obj, method, axis=None):
+    """Planar / cube / cylinder projection written straight into the active UV map.
+    
+    One UV unit per scaled object unit (cylinders: a whole number of repeats
+    around the circumference, so the seam tiles). No edit-mode round trip.
+    """
+    mesh = obj.data
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get('co', co)
+    vertex_index = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get('vertex_index', vertex_index)
+    p = co.reshape(-1, 3)[vertex_index] * np.array(obj.scale, dtype=np.float32)
+    starts, totals, order = polygon_loops(mesh)
+    normals = face_data(mesh)[0][order]
+    
+    if method == 'planar':
+        t1, t2 = plane_basis(axis)
+        uv = np.stack([p @ t1, p @ t2], axis=1)
+    elif method == 'cube':
+        # Drop the coordinate of the axis each face points along
+        other = np.array([[1, 2], [0, 2], [0, 1]])
+        face_axis = np.argmax(np.abs(normals), axis=1)
+        uv = np.take_along_axis(p, other[np.repeat(face_axis, totals)], axis=1)
+    else:
+        t1, t2 = plane_basis(axis)
+        x, y = p @ t1, p @ t2
+        x -= x.mean()
+        y -= y.mean()
+        radius = max(float(np.hypot(x, y).mean()), 1e-6)
+        repeats = max(1, round(2 * np.pi * radius))
+        u = (np.arctan2(y, x) / (2 * np.pi) + 0.5) * repeats
+        # Faces straddling the seam would span the whole strip - move their low side over
+        span = np.maximum.reduceat(u, starts) - np.minimum.reduceat(u, starts)
+        wrap = np.repeat(span > repeats / 2, totals) & (u < repeats / 2)
+        u[wrap] += repeats
+        uv = np.stack([u, (p @ axis) * repeats / (2 * np.pi * radius)], axis=1)
+        # Caps get a planar projection across the axis
+        cap = np.repeat(np.abs(normals @ axis) >= UV_SIDE, totals)
+        uv[cap] = np.stack([x[cap], y[cap]], axis=1)
+    
+    layer = mesh.uv_layers.active or mesh.uv_layers.new(name="UVMap")
+    layer.data.foreach_set('uv', uv.astype(np.float32).ravel())
+    mesh.update()
+
+
+def apply_smart_uv(obj):
+    """Auto-unwrap UVs with the projection that fits the geometry.
+    
+    Planar, cube and cylinder run in NumPy; only irregular shapes need the
+    Smart UV Project operator (and an edit-mode switch).
+    """
+    try:
+        if obj.type != 'MESH': return
+        
+        method, axis = classify_uv(*face_data(obj.data))
+        if method != 'smart':
+            project_uvs(obj, method, axis)
+            log_action(f"[UV] {UV_LABELS[method]} Projection → {obj.name}")
+            return True
+        
+        # Select active object for operations
+        bpy.context.view_layer.objects.active = obj
+        bpy.ops.object.mode_set(mode='EDIT')
+        bpy.ops.mesh.select_all(action='SELECT')
+        bpy.ops.uv.smart_project(angle_limit=66.0, island_margin=0.02)
+        log_action(f"[UV] Smart Project → {obj.name}")
+            
+        bpy.ops.object.mode_set(mode='OBJECT')
+        return True
+    except Exception as e:
+        log_action(f"[UV] Failed: {str(e)}")
+        if obj.mode == 'EDIT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        return False
+
+
+# =============================================================================
+# PBR Map Derivation (local NumPy alternative to extra API calls)
+# =============================================================================
+
+DERIVE_VERSION = 1             # Bump to invalidate cached derived maps
+DERIVED_MAPS = ('roughness', 'normal', 'ao')
+DERIVE_NORMAL_STRENGTH = 2.0   # Bump height per 1024 px of width
+DERIVE_AO_STRENGTH = 6.0
+LUMA = np.array([0.2126, 0.7152, 0.0722], dtype=np.float32)
+
+
+def box_blur(a, radius):
+    """Mean over a (2r+1)^2 window as two running-sum passes (cost independent of r).
+    
+    Edges wrap around - generated textures are meant to tile.
+    """
+    if radius < 1:
+        return a
+    k = 2 * radius + 1
+    h, w = a.shape
+    rows = np.pad(a, ((radius + 1, radius), (0, 0)), mode='wrap').cumsum(0, dtype=np.float32)
+    a = rows[k:k + h] - rows[:h]
+    cols = np.pad(a, ((0, 0), (radius + 1, radius)), mode='wrap').cumsum(1, dtype=np.float32)
+    return (cols[:, k:k + w] - cols[:, :w]) / (k * k)
+
+
+def sobel(height):
+    """(dh/dx, dh/dy) with wrapped edges; rows are bottom-up like Blender's pixels."""
+    p = np.pad(height, 1, mode='wrap')
+    smooth_y = p[:-2] + 2 * p[1:-1] + p[2:]
+    smooth_x = p[:, :-2] + 2 * p[:, 1:-1] + p[:, 2:]
+    gx = (smooth_y[:, 2:] - smooth_y[:, :-2]) / 8
+    gy = (smooth_x[2:] - smooth_x[:-2]) / 8
+    return gx, gy
+
+
+def gray_to_rgba(values):
+    out = np.empty(values.shape + (4,), dtype=np.float32)
+    out[..., :3] = values[..., None]
+    out[..., 3] = 1.0
+    return out
+
+
+def derive_pbr_pixels(rgba, maps=DERIVED_MAPS):
+    """Derive {map_type: (h, w, 4) float32} from base color pixels (h, w, 3|4) in 0..1.
+    
+    height    - luminance, lightly smoothed
+    normal    - Sobel gradient of height, OpenGL tangent space (as Blender expects)
+    ao        - cavities: how far height sits below its neighbourhood mean
+    roughness - local luminance variance (busy = rough, flat = smooth)
+    """
+    h, w = rgba.shape[:2]
+    luma = rgba[..., :3] @ LUMA
+    height = box_blur(luma, 1)
+    result = {}
+    
+    if 'normal' in maps:
+        gx, gy = sobel(height)
+        strength = DERIVE_NORMAL_STRENGTH * w / 1024
+        gx *= -strength
+        gy *= -strength
+        inv = 0.5 / np.sqrt(gx * gx + gy * gy + 1.0)  # Normalize and map -1..1 to 0..1 in one go
+        out = np.empty((h, w, 4), dtype=np.float32)
+        out[..., 0] = gx * inv + 0.5
+        out[..., 1] = gy * inv + 0.5
+        out[..., 2] = inv + 0.5
+        out[..., 3] = 1.0
+        result['normal'] = out
+    
+    if 'ao' in maps:
+        cavity = box_blur(height, max(2, w // 128)) - height
+        result['ao'] = gray_to_rgba(1.0 - np.clip(cavity * DERIVE_AO_STRENGTH, 0.0, 1.0))
+    
+    if 'roughness' in maps:
+        radius = max(1, w // 512)
+        mean = box_blur(luma, radius)
+        std = np.sqrt(np.maximum(box_blur(luma * luma, radius) - mean * mean, 0.0))
+        scale = np.percentile(std[::4, ::4], 95) + 1e-6
+        result['roughness'] = gray_to_rgba(0.4 + 0.6 * np.clip(std / scale, 0.0, 1.0))
+    
+    return result
+
+
+def read_image_pixels(path, keep=True):
+    """Pixels of an image file as (h, w, channels) float32 (main thread only).
+    
+    With keep=False an image no material uses is unloaded again afterwards.
+    """
+    image = bpy.data.images.load(path, check_existing=True)
+    w, h = image.size
+    buf = np.empty(w * h * image.channels, dtype=np.float32)
+    image.pixels.foreach_get(buf)
+    if not keep and not image.users:
+        bpy.data.images.remove(image)
+    return buf.reshape(h, w, -1)
+
+
+def file_stamp(path):
+    """Cache key part for a source image (cache files are already content-addressed)."""
+    return os.path.basename(path), os.path.getsize(path)
+
+
+def to_uint8(pixels):
+    """Float pixels in 0..1 as 8-bit values (rounded, clipped)."""
+    return (np.clip(pixels, 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+
+
+def encode_png(pixels):
+    """8-bit PNG bytes for (h, w, 1|3|4) pixels - float in 0..1 or uint8 - rows bottom-up as in bpy.
+    
+    Pure NumPy + zlib, so it is safe on worker threads (unlike saving via bpy).
+    """
+    h, w, channels = pixels.shape
+    rows = np.zeros((h, w * channels + 1), dtype=np.uint8)  # Leading 0 = no filter
+    rows[:, 1:] = (pixels[::-1] if pixels.dtype == np.uint8 else to_uint8(pixels[::-1])).reshape(h, -1)
+    
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+    
+    header = struct.pack('>IIBBBBB', w, h, 8, {1: 0, 3: 2, 4: 6}[channels], 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) +
+            chunk(b'IDAT', zlib.compress(rows.tobytes(), 6)) + chunk(b'IEND', b''))
+
+
+def derive_pbr_maps(base_path, maps):
+    """Derived map paths {map_type: path} for a base color image, cached on disk.
+    
+    Call from a worker thread: only decoding the base image goes through the main
+    thread (call_on_main); derivation and PNG encoding run here. Repeated calls
+    for the same base image are cache lookups.
+    """
+    try:
+        stamp = file_stamp(base_path)
+    except OSError:
+        return {}
+    digests = {m: DiskCache.digest("derived", DERIVE_VERSION, stamp, m) for m in maps}
+    paths = {m: _texture_cache.lookup(d, ('.png',)) for m, d in digests.items()}
+    todo = [m for m, path in paths.items() if not path]
+    if not todo:
+        return paths
+    
+    start = time.perf_counter()
+    try:
+        derived = derive_pbr_pixels(call_on_main(read_image_pixels, base_path, False), todo)
+        for map_type, pixels in derived.items():
+            check_cancelled()
+            channels = 3 if map_type == 'normal' else 1  # Roughness / AO are grayscale
+            paths[map_type] = _texture_cache.store(digests[map_type], encode_png(pixels[..., :channels]), '.png')
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        log_action(f"[TEXSET] Derivation failed: {str(e)[:40]}")
+        return {m: path for m, path in paths.items() if path}
+    
+    log_action(f"[TEXSET] Derived {', '.join(todo)} in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return paths
+
+
+# =============================================================================
+# ORM Channel Packing (AO / Roughness / Metallic in one image)
+# =============================================================================
+
+ORM_VERSION = 1
+ORM_METALLIC = 0.0   # No metallic map is generated - packed as a constant
+ORM_DEFAULTS = {'ao': 1.0, 'roughness': 0.5}
+
+
+def fit_pixels(values, h, w):
+    """Nearest-neighbour resize of a (rows, cols) array to (h, w)."""
+    if values.shape == (h, w):
+        return values
+    rows = np.arange(h) * values.shape[0] // h
+    cols = np.arange(w) * values.shape[1] // w
+    return values[rows[:, None], cols]
+
+
+def pack_orm_pixels(ao=None, roughness=None, metallic=ORM_METALLIC):
+    """(h, w, 4) ORM pixels: R=AO, G=Roughness, B=Metallic, from grayscale arrays.
+    
+    Missing channels are filled with ORM_DEFAULTS; inputs of different sizes
+    are resampled to the largest.
+    """
+    channels = {'ao': ao, 'roughness': roughness}
+    present = [c for c in channels.values() if c is not None]
+    h = max((c.shape[0] for c in present), default=1)
+    w = max((c.shape[1] for c in present), default=1)
+    
+    out = np.empty((h, w, 4), dtype=np.float32)
+    for index, name in enumerate(('ao', 'roughness')):
+        values = channels[name]
+        out[..., index] = ORM_DEFAULTS[name] if values is None else fit_pixels(values, h, w)
+    out[..., 2] = metallic
+    out[..., 3] = 1.0
+    return out
+
+
+def pack_orm_map(ao_path=None, roughness_path=None):
+    """Path of the packed ORM image for these maps (built once, cached on disk).
+    
+    Call from a worker thread (the maps are decoded via call_on_main). Returns
+    None if it can't be built - callers then wire the separate maps.
+    """
+    try:
+        stamps = [file_stamp(p) if p else None for p in (ao_path, roughness_path)]
+    except OSError:
+        return None
+    digest = DiskCache.digest("orm", ORM_VERSION, stamps, ORM_METALLIC)
+    cached = _texture_cache.lookup(digest, ('.png',))
+    if cached:
+        return cached
+    
+    try:
+        ao, rough = (call_on_main(read_image_pixels, p, False)[..., 0] if p else None
+                     for p in (ao_path, roughness_path))
+        path = _texture_cache.store(digest, encode_png(pack_orm_pixels(ao, rough)[..., :3]), '.png')
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        log_action(f"[SHADER] ORM packing failed: {str(e)[:40]}")
+        return None
+    
+    log_action(f"[SHADER] Packed ORM: {digest[:12]}")
+    return path
+
+
+# =============================================================================
+# Resolution Ladder (one generation, local lower tiers per platform)
+# =============================================================================
+
+TIER_SIZES = {'4K': 4096, '2K': 2048, '1K': 1024, '512': 512}
+LADDER_SOURCE = '2K'  # Generated at least this big so every lower tier can be derived
+PLATFORM_TIERS = {'pc': '4K', 'console': '2K', 'mobile': '512'}
+
+
+def generation_size(size):
+    """API size to request: the larger of size and LADDER_SOURCE."""
+    return max(size, LADDER_SOURCE, key=lambda t: TIER_SIZES.get(t, 0))
+
+
+def target_tier(profile):
+    """Tier materials use: the profile resolution, capped by its platform."""
+    cap = PLATFORM_TIERS.get(profile.get('platform'), '4K')
+    return min(profile.get('resolution', '2K'), cap, key=lambda t: TIER_SIZES.get(t, 0))
+
+
+def current_tier():
+    try:
+        return target_tier(get_project_profile(bpy.context.scene))
+    except:
+        return target_tier(DEFAULT_PROFILE)
+
+
+def image_size(path):
+    """(width, height) read from a PNG/JPEG header without decoding pixels (None if unknown)."""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(24)
+            if head[:8] == b'\x89PNG\r\n\x1a\n':
+                return struct.unpack('>II', head[16:24])
+            if head[:2] != b'\xff\xd8':
+                return None
+            f.seek(2)
+            while True:
+                marker = f.read(4)
+                if len(marker) < 4 or marker[0] != 0xFF:
+                    return None
+                kind, length = marker[1], struct.unpack('>H', marker[2:])[0]
+                if 0xC0 <= kind <= 0xCF and kind not in (0xC4, 0xC8, 0xCC):  # Start of frame
+                    height, width = struct.unpack('>xHH', f.read(5))
+                    return width, height
+                f.seek(length - 2, 1)
+    except (OSError, struct.error):
+        return None
+
+
+def normalize_normals(pixels):
+    """Renormalize the tangent-space vectors in (h, w, c) normal map pixels in place."""
+    vec = pixels[..., :3] * 2.0 - 1.0
+    vec /= np.maximum(np.linalg.norm(vec, axis=-1, keepdims=True), 1e-6)
+    pixels[..., :3] = vec * 0.5 + 0.5
+    return pixels
+
+
+def downsample_pixels(pixels, factor, normal=False):
+    """Area-average (h, w, c) pixels by an integer factor (normals are renormalized)."""
+    h, w, c = pixels.shape
+    h, w = h - h % factor, w - w % factor
+    blocks = pixels[:h, :w].reshape(h // factor, factor, w // factor, factor, c)
+    out = blocks.mean(axis=(1, 3), dtype=np.float32)
+    return normalize_normals(out) if normal else out
+
+
+def resize_pixels(pixels, w, h, normal=False):
+    """(h, w, c) resize of (rows, cols, c) pixels to any size: area-average by the
+    whole factor, then bilinear for the rest (normals are renormalized).
+    """
+    factor = min(pixels.shape[0] // h, pixels.shape[1] // w)
+    if factor > 1:
+        pixels = downsample_pixels(pixels, factor, normal)
+    if pixels.shape[:2] == (h, w):
+        return pixels
+    
+    def axis(n, size):
+        pos = np.clip((np.arange(n) + 0.5) * size / n - 0.5, 0, size - 1)
+        low = pos.astype(np.int64)
+        return low, np.minimum(low + 1, size - 1), (pos - low).astype(np.float32)
+    
+    y0, y1, fy = axis(h, pixels.shape[0])
+    x0, x1, fx = axis(w, pixels.shape[1])
+    fx = fx[None, :, None]
+    top = pixels[y0][:, x0] * (1 - fx) + pixels[y0][:, x1] * fx
+    bottom = pixels[y1][:, x0] * (1 - fx) + pixels[y1][:, x1] * fx
+    out = top + (bottom - top) * fy[:, None, None]
+    return normalize_normals(out) if normal else out
+
+
+def tier_size(w, h, tier):
+    """(w, h) of the tier variant texture_tier makes of a w x h image."""
+    target = TIER_SIZES.get(tier)
+    factor = w // target if target and w // target >= 2 else 1
+    return max(1, w // factor), max(1, h // factor)
+
+
+def tier_digest(path, tier, normal=False):
+    """(downsample factor, cache digest) of path's tier variant - (0, None) if none is needed."""
+    size = image_size(path)
+    target = TIER_SIZES.get(tier)
+    if not size or not target or size[0] // target < 2:
+        return 0, None
+    return size[0] // target, DiskCache.digest("tier", file_stamp(path), tier, normal)
+
+
+def texture_tier(path, tier, normal=False):
+    """Path of the image at path reduced to tier - derived once, then cached.
+    
+    Call from a worker thread: only decoding goes through the main thread
+    (call_on_main); downsampling and PNG encoding run here. Returns path itself
+    when it is already no larger than the tier (or on failure).
+    """
+    try:
+        factor, digest = tier_digest(path, tier, normal)
+    except OSError:
+        return path
+    if not digest:
+        return path
+    cached = _texture_cache.lookup(digest, ('.png',))
+    if cached:
+        return cached
+    
+    try:
+        pixels = downsample_pixels(call_on_main(read_image_pixels, path, False), factor, normal)
+        check_cancelled()
+        return _texture_cache.store(digest, encode_png(pixels[..., :3]), '.png')
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        log_action(f"[TEXTURE] {tier} tier failed: {str(e)[:40]}")
+        return path
+
+
+def cached_tier(path, tier, normal=False):
+    """Tier variant of path if texture_tier already built it, else path (lookup only)."""
+    try:
+        _, digest = tier_digest(path, tier, normal)
+    except OSError:
+        return path
+    return (_texture_cache.lookup(digest, ('.png',)) if digest else None) or path
+
+
+def load_texture_image(path, tier, node_name):
+    """bpy image for an image node: path's tier variant, tagged with its source.
+    
+    Never decodes: variants are built by texture_tier in the job that produced
+    path; until then the full-size source is used.
+    """
+    image = bpy.data.images.load(cached_tier(path, tier, node_name == 'Normal'), check_existing=True)
+    image["forge_source"] = path
+    if node_name in NON_COLOR_NODES:
+        image.colorspace_settings.name = 'Non-Color'
+    return image
+
+
+def forge_image_nodes():
+    """(node, source path) for every image node of a BlenderForge material."""
+    for mat in bpy.data.materials:
+        if "forge_key" not in mat or not mat.node_tree:
+            continue
+        for node in mat.node_tree.nodes:
+            source = node.image.get("forge_source") if getattr(node, 'image', None) else None
+            if source and os.path.exists(source):
+                yield node, source
+
+
+def retier_materials(tier):
+    """Re-point every BlenderForge material's images at tier (local only, no API calls).
+    
+    Missing tier variants are built in a background job; materials are switched
+    over once it finishes. Replaces a re-tier job that is still running.
+    """
+    for job in _jobs.snapshot():
+        if job.active and job.kind == 'retier':
+            _jobs.cancel(job.id)
+    sources = {(source, node.name == 'Normal') for node, source in forge_image_nodes()}
+    
+    def build(job):
+        for count, (source, normal) in enumerate(sorted(sources), 1):
+            check_cancelled()
+            texture_tier(source, tier, normal)
+            job.report(count / len(sources))
+        
+        def done():
+            if not job.cancelled:
+                repoint_materials(tier)
+        run_on_main(done)
+    
+    return _jobs.submit('retier', f"Textures → {tier}", build)
+
+
+def repoint_materials(tier):
+    """Point every BlenderForge material's images at tier's cached variants (main thread)."""
+    count = 0
+    for node, source in list(forge_image_nodes()):
+        image = load_texture_image(source, tier, node.name)
+        if image != node.image:
+            node.image = image
+            count += 1
+    log_action(f"[TEXTURE] {count} images → {tier} tier")
+    stale = sum(1 for mat in bpy.data.materials if mat.get("forge_atlas") not in (None, tier))
+    if stale:
+        log_action(f"[ATLAS] {stale} atlas material(s) were baked for another tier - bake again")
+    return count
+
+
+# =============================================================================
+# Texture Atlas (one shared material for batch-textured scenes)
+# =============================================================================
+
+ATLAS_SIZE = 4096
+ATLAS_PADDING = 4  # Gutter of wrapped texels around each tile, at the final tier (no mip bleeding)
+ATLAS_FILL = {
+    'Base Color': (0.0, 0.0, 0.0, 1.0),
+    'Normal': (0.5, 0.5, 1.0, 1.0),
+    'ORM': (ORM_DEFAULTS['ao'], ORM_DEFAULTS['roughness'], ORM_METALLIC, 1.0),
+}
+
+
+def pack_shelves(sizes, width=ATLAS_SIZE, height=ATLAS_SIZE):
+    """Shelf bin packing, tallest first: sizes [(w, h)] -> ([(page, x, y)], [(page_w, page_h)]).
+    
+    Placements are returned in input order; every size must fit in width x height.
+    Each run of shelves filled to the same width becomes one page, trimmed to
+    exactly what it covers (a short last row gets a page of its own rather than
+    padding out the one above).
+    """
+    bins = []  # {'shelves': [[y, height, used_width, [(index, x)]]], 'top': y of next shelf}
+    for i in sorted(range(len(sizes)), key=lambda i: (-sizes[i][1], -sizes[i][0])):
+        w, h = sizes[i]
+        for bin_ in bins:
+            shelf = next((sh for sh in bin_['shelves'] if h <= sh[1] and sh[2] + w <= width), None)
+            if shelf is None and bin_['top'] + h <= height:
+                shelf = [bin_['top'], h, 0, []]
+                bin_['shelves'].append(shelf)
+                bin_['top'] += h
+            if shelf is not None:
+                break
+        else:
+            shelf = [0, h, 0, []]
+            bins.append({'shelves': [shelf], 'top': h})
+        shelf[3].append((i, shelf[2]))
+        shelf[2] += w
+    
+    placements = [None] * len(sizes)
+    pages = []  # [width, y of first shelf, height]
+    for bin_ in bins:
+        page = None
+        for y, h, used, items in bin_['shelves']:
+            if page is None or used != page[0]:
+                page = [used, y, 0]
+                pages.append(page)
+            page[2] = y + h - page[1]
+            for i, x in items:
+                placements[i] = (len(pages) - 1, x, y - page[1])
+    return placements, [(w, h) for w, _, h in pages]
+
+
+def plan_atlas(sizes, tier):
+    """Layout for source images of sizes [(w, h)] at tier: (tiles [(w, h)], placements, page dims).
+    
+    Each cell - tile plus gutters - is the size of the source's tier variant, so
+    the atlas spends no more texels than the textures it replaces: tiles are
+    resampled to that size minus 2 * ATLAS_PADDING. Pages are packed at the width
+    that wastes the fewest texels, then gives the fewest and squarest pages.
+    """
+    pad = 2 * ATLAS_PADDING
+    cells = [tuple(min(max(n, pad + 1), ATLAS_SIZE) for n in tier_size(w, h, tier)) for w, h in sizes]
+    tiles = [(w - pad, h - pad) for w, h in cells]
+    
+    # Candidate page widths: each run of cells (tallest first) laid side by side
+    widest = max((w for w, _ in cells), default=1)
+    row = itertools.accumulate(w for w, _ in sorted(cells, key=lambda c: (-c[1], -c[0])))
+    widths = sorted({min(n, ATLAS_SIZE) for n in row if n >= widest} | {widest})
+    
+    def cost(layout):
+        dims = layout[1]
+        return sum(w * h for w, h in dims), len(dims), sum(abs(w - h) for w, h in dims)
+    
+    placements, dims = min((pack_shelves(cells, width) for width in widths), key=cost)
+    return tiles, placements, dims
+
+
+def remap_uvs(mesh, rect, atlas_w, atlas_h):
+    """Move the active UV map into rect (x, y, w, h) in atlas pixels.
+    
+    UVs are shifted by whole tiles when they fit in one; otherwise their bounds
+    are scaled down uniformly into the rect (an atlas can't repeat a texture).
+    Returns that scale-down factor (1.0 = texel density kept).
+    """
+    uv = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+    mesh.uv_layers.active.data.foreach_get('uv', uv)
+    uv = uv.reshape(-1, 2)
+    
+    shrink = 1.0
+    if len(uv):
+        low, high = uv.min(axis=0), uv.max(axis=0)
+        shift = np.floor(low)
+        if (high - shift > 1.0).any():
+            shift = low  # Straddles a tile border - tileable textures don't mind the phase
+        uv -= shift
+        shrink = max(1.0, float((high - low).max()))
+        uv /= shrink
+    
+    x, y, w, h = rect
+    uv[:, 0] = (x + uv[:, 0] * w) / atlas_w
+    uv[:, 1] = (y + uv[:, 1] * h) / atlas_h
+    mesh.uv_layers.active.data.foreach_set('uv', uv.ravel())
+    mesh.update()
+    return shrink
+
+
+def image_source(image):
+    """Full-resolution file behind a (possibly tier-reduced) material image."""
+    return image.get("forge_source") or bpy.path.abspath(image.filepath)
+
+
+def atlas_tile(path, size, normal=False):
+    """RGBA pixels of the image at path resized to size (w, h) (main thread only)."""
+    pixels = read_image_pixels(path, keep=False)
+    if pixels.shape[2] < 4:
+        pixels = np.concatenate([pixels, np.ones(pixels.shape[:2] + (4 - pixels.shape[2],), np.float32)], axis=2)
+    return resize_pixels(pixels, size[0], size[1], normal)
+
+
+def material_tiles(mat, node_names, size):
+    """{node name: RGBA tile} of an atlas cell for mat (channels it lacks get ATLAS_FILL)."""
+    nodes = mat.node_tree.nodes
+    
+    def source(name):
+        node = nodes.get(name)
+        return image_source(node.image) if node and node.image else None
+    
+    tiles = {}
+    for name in node_names:
+        path = source(name)
+        if path:
+            tiles[name] = atlas_tile(path, size, normal=(name == 'Normal'))
+        elif name == 'ORM' and (source('AO') or source('Roughness')):
+            # Separate AO / Roughness maps are packed on the fly
+            ao, rough = (atlas_tile(source(n), size)[..., 0] if source(n) else None for n in ('AO', 'Roughness'))
+            tiles[name] = pack_orm_pixels(ao, rough)
+        else:
+            tiles[name] = np.empty((size[1], size[0], 4), dtype=np.float32)
+            tiles[name][...] = ATLAS_FILL[name]
+    return tiles
+
+
+def material_shading(mat):
+    """Shading model of a BlenderForge material ('pbr', 'toon' or 'unlit')."""
+    return mat.get("forge_shading") or mat.name.split("_")[1].lower()
+
+
+def bake_atlas(objects):
+    """Pack the textures of BlenderForge materials on objects into shared atlas
+    pages, remap UVs and give each object its page's material.
+    
+    Objects need one material slot holding a BlenderForge material and a UV map;
+    objects already on an atlas are left alone. Each shading model gets its own
+    pages and material (PBR keeps Normal and ORM, packing separate AO/Roughness).
+    Pages are built for the current platform tier and not re-tiered later.
+    Main thread only. Returns (objects changed, atlas pages, objects whose UVs
+    had to be scaled down).
+    """
+    groups = {}  # shading -> {material: [objects]}
+    for obj in objects:
+        if obj.type != 'MESH' or len(obj.material_slots) != 1 or not obj.data.uv_layers.active:
+            continue
+        mat = obj.material_slots[0].material
+        if not mat or "forge_key" not in mat or mat.get("forge_atlas") or not mat.node_tree:
+            continue
+        node = mat.node_tree.nodes.get('Base Color')
+        if node and node.image:
+            groups.setdefault(material_shading(mat), {}).setdefault(mat, []).append(obj)
+    
+    tier = current_tier()
+    changed = pages_total = 0
+    scaled = []
+    remapped = set()
+    for shading, members in groups.items():
+        mats = list(members)
+        
+        def present(*names):
+            return any(getattr(mat.node_tree.nodes.get(n), 'image', None) for mat in mats for n in names)
+        
+        node_names = ['Base Color']
+        if shading == 'pbr' and present('Normal'):
+            node_names.append('Normal')
+        if shading == 'pbr' and present('ORM', 'AO', 'Roughness'):
+            node_names.append('ORM')
+        
+        sources = [image_source(mat.node_tree.nodes['Base Color'].image) for mat in mats]
+        sizes = [image_size(path) or tuple(bpy.data.images.load(path, check_existing=True).size)
+                 for path in sources]
+        tiles, placements, dims = plan_atlas(sizes, tier)
+        
+        pad = ATLAS_PADDING
+        wrap = ((pad, pad), (pad, pad), (0, 0))
+        key = DiskCache.digest("atlas", shading, [mat.get("forge_key") for mat in mats], tier, pad)
+        atlas_mats = []
+        for page_no, (w, h) in enumerate(dims):
+            # One page at a time, as 8-bit RGB - only this page's maps are in memory
+            page = {name: np.zeros((h, w, 3), dtype=np.uint8) for name in node_names}
+            for mat, size, (tile_page, x, y) in zip(mats, tiles, placements):
+                if tile_page != page_no:
+                    continue
+                for name, tile in material_tiles(mat, node_names, size).items():
+                    cell = to_uint8(np.pad(tile[..., :3], wrap, mode='wrap'))
+                    page[name][y:y + cell.shape[0], x:x + cell.shape[1]] = cell
+            images = {}
+            for name in node_names:
+                images[name] = _texture_cache.store(DiskCache.digest(key, page_no, name), encode_png(page.pop(name)), '.png')
+            atlas_mats.append(create_atlas_material(shading, images, DiskCache.digest(key, page_no)[:12], tier))
+        
+        for mat, size, (page_no, x, y) in zip(mats, tiles, placements):
+            w, h = dims[page_no]
+            for obj in members[mat]:
+                if obj.data.name_full not in remapped:
+                    if remap_uvs(obj.data, (x + pad, y + pad) + size, w, h) > 1.0:
+                        scaled.append(obj.name)
+                    remapped.add(obj.data.name_full)
+                obj.material_slots[0].material = atlas_mats[page_no]
+                changed += 1
+        pages_total += len(dims)
+        log_action(f"[ATLAS] {shading.upper()}: {len(mats)} images → {len(dims)} atlas(es) at {tier}")
+    
+    if scaled:
+        log_action(f"[ATLAS] {len(scaled)} objects' UVs span several tiles - scaled down to fit")
+    return changed, pages_total, scaled
+
+
+def create_atlas_material(shading, images, key, tier):
+    """Shared material for one atlas page: the shading model's template with
+    images {node_name: path} loaded as-is (atlases are built for their tier).
+    """
+    name = f"Forge_Atlas_{shading.upper()}_{key}"
+    mat = bpy.data.materials.get(name)
+    if mat and mat.get("forge_key") == key:
+        return mat
+    
+    variant = (shading,)
+    if shading == 'pbr':
+        variant = ('pbr', False, 'Normal' in images) + ((False, True) if 'ORM' in images else ())
+    mat = get_material_template(variant).copy()
+    mat.name = name
+    mat.use_fake_user = False
+    mat["forge_key"] = key
+    mat["forge_shading"] = shading
+    mat["forge_atlas"] = tier
+    
+    nodes = mat.node_tree.nodes
+    for node_name, path in images.items():
+        image = bpy.data.images.load(path, check_existing=True)
+        if node_name in NON_COLOR_NODES:
+            image.colorspace_settings.name = 'Non-Color'
+        nodes[node_name].image = image
+    return mat
+
+
+# =============================================================================
+# Batch Texturing (concurrent scheduler)
+# =============================================================================
+
+def format_eta(seconds):
+    """Format remaining seconds as 1h02m / 3m20s / 45s."""
+    seconds = int(max(0, seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+
+class TextureBatch:
+    """Textures many objects concurrently with progress, ETA and failure report.
+    
+    jobs: list of (obj_name, prompt) collected on the main thread - workers never
+    touch bpy objects, results are handed to on_result(obj_name, texture_set).
+    Objects with identical prompts share one generation.
+    """
+    
+    def __init__(self, jobs, profile, size, use_hq=False, workers=4):
+        self.jobs = jobs
+        self.profile = profile
+        self.size = size
+        self.use_hq = use_hq
+        self.workers = max(1, workers)
+        self.groups = {}  # prompt -> [obj_name, ...]
+        for name, prompt in jobs:
+            self.groups.setdefault(prompt, []).append(name)
+        self.succeeded = []
+        self.failed = []  # (obj_name, error)
+        self.started = 0.0
+    
+    @property
+    def finished(self):
+        return len(self.succeeded) + len(self.failed)
+    
+    def eta(self):
+        """Remaining time estimate from observed throughput."""
+        if not self.finished:
+            return "…"
+        elapsed = time.time() - self.started
+        return format_eta(elapsed / self.finished * (len(self.jobs) - self.finished))
+    
+    def _texture_one(self, obj_name, prompt):
+        if self.use_hq:
+            texture_set = generate_texture_set(prompt, self.profile, obj_name)
+        else:
+            path, _ = generate_texture(prompt, self.size)
+            if path:
+                texture_tier(path, target_tier(self.profile))  # Looked up when applied
+            texture_set = {'base_color': path} if path else {}
+        if not texture_set:
+            raise Exception("No image generated")
+        return texture_set
+    
+    def run(self, on_result):
+        """Run all jobs (blocking - call from a worker thread)."""
+        self.started = time.time()
+        total = len(self.jobs)
+        set_status(f"🎨 0/{total} · {len(self.groups)} unique", "Batch started")
         
-        # Select active object for operations
-        bpy.context.view_layer.objects.active = obj
-        bpy.ops.object.mode_set(mode='EDIT')
-        bpy.ops.mesh.select_all(action='SELECT')
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(len(self.groups), self.workers))
+        futures = {submit_with_token(executor, self._texture_one, names[0], prompt): names
+                   for prompt, names in self.groups.items()}
+        try:
+            for future in concurrent.futures.as_completed(futures):
+                names = futures[future]
+                try:
+                    texture_set = future.result()
+                    for obj_name in names:
+                        on_result(obj_name, texture_set)
+                    self.succeeded.extend(names)
+                except Exception as e:
+                    self.failed.extend((obj_name, str(e)[:60]) for obj_name in names)
+                    log_action(f"[BATCH] Failed {', '.join(names)[:30]}: {str(e)[:40]}")
+                
+                set_status(f"🎨 {self.finished}/{total} · ETA {self.eta()}", names[0])
+                report_progress(self.finished / total, f"ETA {self.eta()}")
+                if is_cancelled():
+                    break
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
         
-        if is_surface or (is_flat and not 'prop' in obj.name.lower()):
-            # Cube projection for architectural/flat surfaces
-            bpy.ops.uv.cube_project(cube_size=1.0, correct_aspect=True)
-            log_action(f"[UV] Cube Projection → {obj.name}")
-        else:
-            # Smart project for complex shapes
-            bpy.ops.uv.smart_project(angle_limit=66.0, island_margin=0.02)
-            log_action(f"[UV] Smart Project → {obj.name}")
-            
-        bpy.ops.object.mode_set(mode='OBJECT')
-        return True
-    except Exception as e:
-        log_action(f"[UV] Failed: {str(e)}")
-        bpy.ops.object.mode_set(mode='OBJECT')
-        return False
+        log_action(f"[BATCH] {len(self.succeeded)}/{total} textured, {len(self.failed)} failed")
+        return self
+    
+    def summary(self):
+        text = f"✅ {len(self.succeeded)}/{len(self.jobs)}"
+        if self.failed:
+            text += f" · ❌ {len(self.failed)} failed"
+        return text
 
 
 # =============================================================================
 # Shader Graph Factory (profile-based)
 # =============================================================================
 
-def create_pbr_material(obj, image_path, roughness_path=None, normal_path=None):
-    """Create PBR material with optional maps."""
-    mat_name = f"Forge_{obj.name}"
-    mat = bpy.data.materials.get(mat_name) or bpy.data.materials.new(name=mat_name)
+# Image nodes that receive non-color data
+NON_COLOR_NODES = {'Roughness', 'Normal', 'AO', 'ORM'}
+
+
+def build_pbr_nodes(mat, roughness=True, normal=True, ao=False, orm=False):
+    """Build Principled BSDF node tree (image nodes named by map, no images yet).
+    
+    With orm, one 'ORM' image is split by Separate Color: R=AO, G=Roughness,
+    B=Metallic (roughness/ao are then ignored). AO multiplies the base color.
+    """
     mat.use_nodes = True
     nodes = mat.node_tree.nodes
     links = mat.node_tree.links
@@ -652,40 +2985,62 @@ def create_pbr_material(obj, image_path, roughness_path=None, normal_path=None):
     
     # Base Color
     tex_base = nodes.new('ShaderNodeTexImage')
+    tex_base.name = 'Base Color'
     tex_base.location = (-300, 100)
-    tex_base.image = bpy.data.images.load(image_path, check_existing=True)
-    links.new(tex_base.outputs['Color'], bsdf.inputs['Base Color'])
+    
+    # AO darkens the base color (Principled BSDF has no AO input)
+    if ao or orm:
+        multiply = nodes.new('ShaderNodeMix')
+        multiply.data_type = 'RGBA'
+        multiply.blend_type = 'MULTIPLY'
+        multiply.location = (-100, 150)
+        multiply.inputs[0].default_value = 1.0  # Factor; 6/7 = A/B color, 2 = color result
+        links.new(tex_base.outputs['Color'], multiply.inputs[6])
+        links.new(multiply.outputs[2], bsdf.inputs['Base Color'])
+    else:
+        links.new(tex_base.outputs['Color'], bsdf.inputs['Base Color'])
+    
+    if orm:
+        tex_orm = nodes.new('ShaderNodeTexImage')
+        tex_orm.name = 'ORM'
+        tex_orm.location = (-500, -150)
+        
+        separate = nodes.new('ShaderNodeSeparateColor')
+        separate.location = (-250, -150)
+        links.new(tex_orm.outputs['Color'], separate.inputs['Color'])
+        links.new(separate.outputs['Red'], multiply.inputs[7])
+        links.new(separate.outputs['Green'], bsdf.inputs['Roughness'])
+        links.new(separate.outputs['Blue'], bsdf.inputs['Metallic'])
+    elif ao:
+        tex_ao = nodes.new('ShaderNodeTexImage')
+        tex_ao.name = 'AO'
+        tex_ao.location = (-500, 300)
+        links.new(tex_ao.outputs['Color'], multiply.inputs[7])
     
     # Roughness (if provided or estimate from base)
-    if roughness_path:
+    if roughness and not orm:
         tex_rough = nodes.new('ShaderNodeTexImage')
+        tex_rough.name = 'Roughness'
         tex_rough.location = (-300, -150)
-        tex_rough.image = bpy.data.images.load(roughness_path, check_existing=True)
-        tex_rough.image.colorspace_settings.name = 'Non-Color'
         links.new(tex_rough.outputs['Color'], bsdf.inputs['Roughness'])
-    else:
+    elif not orm:
         # Derive roughness from base color (simple inversion of saturation)
         bsdf.inputs['Roughness'].default_value = 0.5
     
     # Normal (if provided)
-    if normal_path:
+    if normal:
         tex_normal = nodes.new('ShaderNodeTexImage')
+        tex_normal.name = 'Normal'
         tex_normal.location = (-300, -400)
-        tex_normal.image = bpy.data.images.load(normal_path, check_existing=True)
-        tex_normal.image.colorspace_settings.name = 'Non-Color'
         
         normal_map = nodes.new('ShaderNodeNormalMap')
         normal_map.location = (-100, -400)
         links.new(tex_normal.outputs['Color'], normal_map.inputs['Color'])
         links.new(normal_map.outputs['Normal'], bsdf.inputs['Normal'])
-    
-    return mat
 
 
-def create_toon_material(obj, image_path):
-    """Create cel-shaded toon material."""
-    mat_name = f"Forge_{obj.name}"
-    mat = bpy.data.materials.get(mat_name) or bpy.data.materials.new(name=mat_name)
+def build_toon_nodes(mat):
+    """Build cel-shaded toon node tree."""
     mat.use_nodes = True
     nodes = mat.node_tree.nodes
     links = mat.node_tree.links
@@ -706,8 +3061,8 @@ def create_toon_material(obj, image_path):
     
     # Texture
     tex = nodes.new('ShaderNodeTexImage')
+    tex.name = 'Base Color'
     tex.location = (-200, 100)
-    tex.image = bpy.data.images.load(image_path, check_existing=True)
     links.new(tex.outputs['Color'], diffuse.inputs['Color'])
     
     # Shader to RGB for cel-shading
@@ -729,14 +3084,10 @@ def create_toon_material(obj, image_path):
     links.new(emission.outputs['Emission'], mix.inputs[2])
     links.new(diffuse.outputs['BSDF'], mix.inputs[1])
     mix.inputs['Fac'].default_value = 0.8
-    
-    return mat
 
 
-def create_unlit_material(obj, image_path):
-    """Create unlit/emission material for mobile/UI."""
-    mat_name = f"Forge_{obj.name}"
-    mat = bpy.data.materials.get(mat_name) or bpy.data.materials.new(name=mat_name)
+def build_unlit_nodes(mat):
+    """Build unlit/emission node tree."""
     mat.use_nodes = True
     nodes = mat.node_tree.nodes
     links = mat.node_tree.links
@@ -754,13 +3105,113 @@ def create_unlit_material(obj, image_path):
     
     # Texture
     tex = nodes.new('ShaderNodeTexImage')
+    tex.name = 'Base Color'
     tex.location = (-200, 0)
-    tex.image = bpy.data.images.load(image_path, check_existing=True)
     links.new(tex.outputs['Color'], emission.inputs['Color'])
+
+
+NODE_BUILDERS = {
+    'pbr': build_pbr_nodes,
+    'toon': build_toon_nodes,
+    'unlit': build_unlit_nodes,
+}
+
+
+def get_material_template(variant):
+    """Cached template material for variant, e.g. ('pbr', True, False) or ('toon',).
+    
+    Built once per .blend (hidden, fake user); instances are copies of it.
+    """
+    name = ".Forge_Template_" + "_".join(str(v) for v in variant)
+    template = bpy.data.materials.get(name)
+    if template is None:
+        template = bpy.data.materials.new(name=name)
+        template.use_fake_user = True
+        NODE_BUILDERS[variant[0]](template, *variant[1:])
+    return template
+
+
+def instance_material(variant, images):
+    """Shared material for variant + images {node_name: path}.
+    
+    Objects with identical inputs share one datablock; new ones are a copy of
+    the template with images swapped in (no node-by-node rebuild).
+    Images are loaded at the current platform tier (see retier_materials).
+    """
+    key = DiskCache.digest(variant, sorted((n, os.path.abspath(p)) for n, p in images.items()))[:12]
+    name = f"Forge_{variant[0].upper()}_{key}"
+    mat = bpy.data.materials.get(name)
+    if mat and mat.get("forge_key") == key:
+        return mat
+    
+    mat = get_material_template(variant).copy()
+    mat.name = name
+    mat.use_fake_user = False
+    mat["forge_key"] = key
+    mat["forge_shading"] = variant[0]
+    
+    nodes = mat.node_tree.nodes
+    tier = current_tier()
+    for node_name, path in images.items():
+        nodes[node_name].image = load_texture_image(path, tier, node_name)
+    return mat
+
+
+def preview_material(obj, variant, images):
+    """Unshared in-progress material for obj while HQ maps are still arriving.
     
+    Updated in place as maps come in (a new copy only when the variant changes),
+    so partial sets don't each leave a keyed instance behind.
+    """
+    tag = "_".join(str(v) for v in variant)
+    mat = obj.data.materials[0] if obj.data.materials else None
+    if not (mat and mat.get("forge_preview") == tag and mat.users == 1):
+        mat = get_material_template(variant).copy()
+        mat.name = f"Forge_Preview_{obj.name}"
+        mat.use_fake_user = False
+        mat["forge_preview"] = tag
+    
+    nodes = mat.node_tree.nodes
+    tier = current_tier()
+    for node_name, path in images.items():
+        nodes[node_name].image = load_texture_image(path, tier, node_name)
     return mat
 
 
+def pbr_inputs(image_path, roughness_path=None, normal_path=None, ao_path=None, orm_path=None):
+    """(variant, images) of a PBR material with optional maps (orm_path replaces roughness/AO)."""
+    if orm_path:
+        roughness_path = ao_path = None
+    images = {'Base Color': image_path}
+    if roughness_path:
+        images['Roughness'] = roughness_path
+    if normal_path:
+        images['Normal'] = normal_path
+    if ao_path:
+        images['AO'] = ao_path
+    if orm_path:
+        images['ORM'] = orm_path
+    variant = ('pbr', bool(roughness_path), bool(normal_path))
+    if ao_path or orm_path:
+        variant += (bool(ao_path), bool(orm_path))
+    return variant, images
+
+
+def create_pbr_material(image_path, roughness_path=None, normal_path=None, ao_path=None, orm_path=None):
+    """Get/create shared PBR material with optional maps (orm_path replaces roughness/AO)."""
+    return instance_material(*pbr_inputs(image_path, roughness_path, normal_path, ao_path, orm_path))
+
+
+def create_toon_material(image_path):
+    """Get/create shared cel-shaded toon material."""
+    return instance_material(('toon',), {'Base Color': image_path})
+
+
+def create_unlit_material(image_path):
+    """Get/create shared unlit/emission material for mobile/UI."""
+    return instance_material(('unlit',), {'Base Color': image_path})
+
+
 def apply_texture_to_object(obj, image_path, profile=None):
     """Apply texture using profile-based shader selection."""
     if profile is None:
@@ -773,17 +3224,18 @@ def apply_texture_to_object(obj, image_path, profile=None):
     
     # Select shader based on profile
     if shading == 'toon':
-        mat = create_toon_material(obj, image_path)
+        mat = create_toon_material(image_path)
     elif shading == 'unlit':
-        mat = create_unlit_material(obj, image_path)
+        mat = create_unlit_material(image_path)
     else:  # Default PBR
-        mat = create_pbr_material(obj, image_path)
+        mat = create_pbr_material(image_path)
     
     # Apply material
     if obj.data.materials:
         obj.data.materials[0] = mat
     else:
         obj.data.materials.append(mat)
+        _panel_state.invalidate('meshes')
     
     log_action(f"[SHADER] {shading.upper()} → {obj.name}")
     return True
@@ -846,18 +3298,18 @@ def get_project_context():
         if desc:
             parts.append(f"PROJECT: {desc}")
         
-        log = get_project_log(scene)
-        if log:
-            recent = log[-10:]
+        recent = _project_log.lines(last=10)
+        if recent:
             parts.append(f"RECENT ACTIONS:\n" + "\n".join(recent))
     except:
         pass
     return "\n\n".join(parts) if parts else ""
 
 
-def get_system():
+def get_system(project=True):
+    """System prompt; project=False gives only the static part (cacheable server-side)."""
     v = ".".join(map(str, bpy.app.version))
-    project_ctx = get_project_context()
+    project_ctx = get_project_context() if project else ""
     project_section = f"\n\nPROJECT CONTEXT\n{project_ctx}" if project_ctx else ""
     
     return f'''You are "BlenderForge", expert Blender {v} assistant for UNITY-READY 3D assets.{project_section}
@@ -902,6 +3354,209 @@ OBJECT ORGANIZATION
 19) Use consistent scale across all parts'''
 
 
+# =============================================================================
+# Conversation Window (token-budgeted _chat_history)
+# =============================================================================
+
+CHARS_PER_TOKEN = 4        # Rough average for English prose + Python
+COMPACT_TURN_CHARS = 400   # Max length of a summarized old turn
+
+_SCENE_PREAMBLE = re.compile(r'^\[Scene: .*?\]\n\n', re.DOTALL)
+_CODE_BLOCK = re.compile(r'```(?:python)?\s*\n(.*?)```', re.DOTALL)
+
+
+def estimate_tokens(text):
+    """Local token estimate - no tokenizer round trip."""
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def message_tokens(message):
+    return sum(estimate_tokens(p.get('text', '')) for p in message['parts'])
+
+
+def code_digest(code):
+    """One-line stand-in for a code block: size plus the names it defines/creates."""
+    defs = re.findall(r'^\s*(?:def|class)\s+(\w+)', code, re.MULTILINE)
+    names = re.findall(r'\.name\s*=\s*["\']([^"\']+)', code)
+    digest = f"[code: {len(code.splitlines())} lines"
+    if defs:
+        digest += f"; defs {', '.join(defs[:6])}"
+    if names:
+        digest += f"; objects {', '.join(names[:8])}"
+    return digest + "]"
+
+
+@functools.lru_cache(maxsize=256)
+def compact_text(text):
+    """Summary of an old turn: scene preamble dropped, code replaced by a digest."""
+    text = _SCENE_PREAMBLE.sub('', text)
+    text = _CODE_BLOCK.sub(lambda m: code_digest(m.group(1)), text)
+    if len(text) > COMPACT_TURN_CHARS:
+        text = text[:COMPACT_TURN_CHARS] + " …"
+    return text
+
+
+def build_chat_window(history, system=None, budget=None, keep_turns=None):
+    """Messages to send for history within a token budget.
+    
+    The last keep_turns exchanges (plus a pending user message) are sent verbatim;
+    older turns are compacted and the oldest dropped once the budget (minus the
+    system prompt) is used up.
+    """
+    budget = (budget or get_context_budget()) - estimate_tokens(system or "")
+    keep = 2 * (keep_turns or get_keep_turns())
+    if history and history[-1]["role"] == "user":
+        keep += 1
+    split = max(0, len(history) - keep)
+    
+    recent = history[split:]
+    used = sum(message_tokens(m) for m in recent)
+    
+    older = []
+    for message in reversed(history[:split]):
+        compacted = {"role": message["role"],
+                     "parts": [{"text": compact_text(message["parts"][0].get("text", ""))}]}
+        cost = message_tokens(compacted)
+        if used + cost > budget:
+            break
+        older.append(compacted)
+        used += cost
+    
+    window = older[::-1] + recent
+    # Conversation must start with a user turn
+    while window and window[0]["role"] != "user":
+        window.pop(0)
+    return window
+
+
+def prepare_chat(history):
+    """(messages, system, cacheable) for a Code AI request.
+    
+    With the context cache on (and the static rules big enough for the API to
+    cache), system is only those rules and the project context travels in the
+    latest user turn instead.
+    """
+    system = get_system(project=False)
+    if not is_context_cache() or not ContextCache.eligible(get_model(), system):
+        system = get_system()
+        return build_chat_window(history, system), system, False
+    
+    messages = build_chat_window(history, system)
+    project_ctx = get_project_context()
+    if project_ctx and messages:
+        last = messages[-1]
+        messages[-1] = {"role": last["role"],
+                        "parts": [{"text": f"PROJECT CONTEXT\n{project_ctx}"}] + last["parts"]}
+    return messages, system, True
+
+
+# =============================================================================
+# Scene Digest (kept current from depsgraph updates)
+# =============================================================================
+
+SCENE_DIGEST_TOKENS = 600  # Cap on the digest attached to each Code AI request
+
+
+class SceneDigest:
+    """Compact scene summary for the model, updated incrementally.
+    
+    One row per object: type, vertex count, materials and world-space bounding
+    box (min..max corner), grouped by collection.
+    
+    depsgraph_update_post marks changed objects dirty; text() recomputes only those
+    rows (main thread only) and caches the joined text until something changes.
+    """
+    
+    def __init__(self):
+        self.rows = {}  # obj name -> (collection, line)
+        self.dirty = set()
+        self.all_dirty = True
+        self.prune = False  # Objects may have been removed/renamed
+        self._text = None
+    
+    def mark(self, name):
+        self.dirty.add(name)
+        if name not in self.rows:
+            self.prune = True
+        self._text = None
+    
+    def mark_all(self):
+        self.all_dirty = True
+        self._text = None
+    
+    def mark_structure(self):
+        self.prune = True
+        self._text = None
+    
+    @staticmethod
+    def summarize(obj):
+        line = f"{obj.name} ({obj.type}"
+        if obj.type == 'MESH':
+            line += f", {len(obj.data.vertices)}v"
+        mats = [slot.material.name for slot in obj.material_slots if slot.material]
+        if mats:
+            line += f", mat {'/'.join(mats[:2])}"
+        # World-space bounds tell the model where things are, not just how big
+        m = np.array(obj.matrix_world, dtype=np.float32)
+        corners = np.array(obj.bound_box, dtype=np.float32) @ m[:3, :3].T + m[:3, 3]
+        low, high = corners.min(axis=0), corners.max(axis=0)
+        line += f", bbox {','.join(f'{v:.2f}' for v in low)}..{','.join(f'{v:.2f}' for v in high)}m)"
+        collection = obj.users_collection[0].name if obj.users_collection else "Scene"
+        return collection, line
+    
+    def refresh(self):
+        objects = bpy.data.objects
+        if self.all_dirty:
+            self.rows = {obj.name: self.summarize(obj) for obj in objects}
+            self.all_dirty = self.prune = False
+            self.dirty.clear()
+            return
+        for name in self.dirty:
+            obj = objects.get(name)
+            if obj:
+                self.rows[name] = self.summarize(obj)
+            else:
+                self.rows.pop(name, None)
+        self.dirty.clear()
+        if self.prune:
+            self.rows = {n: r for n, r in self.rows.items() if n in objects}
+            self.prune = False
+    
+    def text(self, max_tokens=SCENE_DIGEST_TOKENS):
+        """Digest grouped by collection, capped at max_tokens (estimated)."""
+        if self._text is not None:
+            return self._text
+        self.refresh()
+        
+        groups = {}
+        for collection, line in self.rows.values():
+            groups.setdefault(collection, []).append(line)
+        
+        budget = max_tokens * CHARS_PER_TOKEN
+        out = [f"{len(self.rows)} objects"]
+        used = len(out[0])
+        shown = 0
+        for collection, lines in sorted(groups.items()):
+            header = f"{collection}:"
+            if used + len(header) > budget:
+                break
+            out.append(header)
+            used += len(header)
+            for line in lines:
+                if used + len(line) + 2 > budget:
+                    break
+                out.append(f"  {line}")
+                used += len(line) + 2
+                shown += 1
+        if shown < len(self.rows):
+            out.append(f"… +{len(self.rows) - shown} more")
+        self._text = "\n".join(out)
+        return self._text
+
+
+_scene_digest = SceneDigest()
+
+
 # =============================================================================
 # Helpers
 # =============================================================================
@@ -909,8 +3564,7 @@ OBJECT ORGANIZATION
 def get_context():
     try:
         obj = bpy.context.active_object
-        objs = [o.name for o in bpy.data.objects][:5]
-        return f"Active: {obj.name if obj else 'None'}, Objects: {objs}"
+        return f"Active: {obj.name if obj else 'None'}\n{_scene_digest.text()}"
     except:
         return ""
 
@@ -946,19 +3600,25 @@ def run_code(code):
         return False, f"❌ {e}"
 
 
-def wrap_text(ctx, text, parent, max_lines=20):
-    w = int(ctx.region.width / 7)
-    wrapper = textwrap.TextWrapper(width=w)
-    n = 0
+@functools.lru_cache(maxsize=32)
+def wrap_lines(text, width, max_lines=20):
+    """Wrapped label lines for text (cached - panels redraw far more often than text changes)."""
+    wrapper = textwrap.TextWrapper(width=width)
+    lines = []
     for part in text.split("\n"):
-        if n >= max_lines:
-            parent.label(text="...")
+        if len(lines) >= max_lines:
+            lines.append("...")
             break
         for line in wrapper.wrap(part) or [""]:
-            if n >= max_lines:
+            if len(lines) >= max_lines:
                 break
-            parent.label(text=line)
-            n += 1
+            lines.append(line)
+    return tuple(lines)
+
+
+def wrap_text(ctx, text, parent, max_lines=20):
+    for line in wrap_lines(text, int(ctx.region.width / 7), max_lines):
+        parent.label(text=line)
 
 
 def test_connection():
@@ -968,18 +3628,13 @@ def test_connection():
         return False, "Set API Key"
     
     try:
-        model = get_model()
-        version = "v1alpha" if "preview" in model else "v1beta"
-        url = f"https://generativelanguage.googleapis.com/{version}/models/{model}:generateContent?key={key}"
+        url = api_url(get_model())
         
         payload = {"contents": [{"role": "user", "parts": [{"text": "Hi"}]}]}
-        data = json.dumps(payload).encode('utf-8')
-        req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json'})
         
-        with urllib.request.urlopen(req, context=ssl.create_default_context(), timeout=10) as resp:
-            if 'candidates' in json.loads(resp.read().decode('utf-8')):
-                set_status(f"✅ {model_name()} connected", "Ready")
-                return True, "OK"
+        if 'candidates' in api_post(url, payload, timeout=10):
+            set_status(f"✅ {model_name()} connected", "Ready")
+            return True, "OK"
         
         set_status("⚠️ Unexpected", "")
         return False, "Unexpected"
@@ -989,6 +3644,102 @@ def test_connection():
         return False, str(e)[:50]
 
 
+# =============================================================================
+# Panel View Model (parsed once, invalidated by property updates / depsgraph)
+# =============================================================================
+
+class PanelState:
+    """Cached data for FORGE_PT_* draw() so redraws don't re-parse JSON or scan objects.
+    
+    Each entry is rebuilt only after invalidate(key) bumps its version.
+    """
+    
+    def __init__(self):
+        self.versions = {}
+        self.object_count = 0  # len(bpy.data.objects) at the last depsgraph update
+        self._cache = {}
+    
+    def invalidate(self, key=None):
+        if key is None:
+            for k in list(self.versions):
+                self.versions[k] += 1
+        else:
+            self.versions[key] = self.versions.get(key, 0) + 1
+    
+    def _get(self, key, scene, build):
+        version = self.versions.setdefault(key, 0)
+        slot = (key, scene.as_pointer())
+        hit = self._cache.get(slot)
+        if hit is None or hit[0] != version:
+            hit = self._cache[slot] = (version, build(scene))
+        return hit[1]
+    
+    def history(self, scene):
+        return self._get('history', scene, get_response_history)
+    
+    def profile(self, scene):
+        return self._get('profile', scene, get_project_profile)
+    
+    def log(self, scene):
+        return self._get('log', scene, lambda scene: get_project_log(scene)[-5:])
+    
+    def meshes(self, scene, limit=5):
+        """(mesh count, [(name, has_material)] for the first few meshes)."""
+        def build(scene):
+            mesh_objs = [o for o in bpy.data.objects if o.type == 'MESH']
+            return len(mesh_objs), [(o.name, bool(o.data.materials)) for o in mesh_objs[:limit]]
+        return self._get('meshes', scene, build)
+
+
+_panel_state = PanelState()
+
+
+def invalidate_panel(key):
+    """Property update callback factory."""
+    def update(self, context):
+        _panel_state.invalidate(key)
+    return update
+
+
+@bpy.app.handlers.persistent
+def on_depsgraph_update(scene, depsgraph):
+    rebind_project_log(scene)
+    
+    # The mesh list changes when objects are added, removed, relinked or renamed or
+    # get other materials. Edit-mode / sculpt strokes (geometry) and transforms don't
+    # change it, so they must not cost a bpy.data.objects scan on the next redraw.
+    count = len(bpy.data.objects)
+    structure = count != _panel_state.object_count or depsgraph.id_type_updated('COLLECTION')
+    _panel_state.object_count = count
+    
+    for update in depsgraph.updates:
+        if isinstance(update.id, bpy.types.Object):
+            _scene_digest.mark(update.id.original.name)
+        if not structure and isinstance(update.id, (bpy.types.Object, bpy.types.Mesh)):
+            structure = not (update.is_updated_geometry or update.is_updated_transform)
+    
+    if structure:
+        _panel_state.invalidate('meshes')
+        _scene_digest.mark_structure()
+
+
+@bpy.app.handlers.persistent
+def on_load_post(*args):
+    _panel_state.invalidate()
+    _scene_digest.mark_all()
+    try:
+        _project_log.load(bpy.context.scene)
+    except:
+        pass
+
+
+@bpy.app.handlers.persistent
+def on_undo_redo(*args):
+    # Undo restores scene data - rebuild derived state, but keep the in-memory log
+    _panel_state.invalidate()
+    _scene_digest.mark_all()
+
+
 # =============================================================================
 # UI - Main Panel (Code AI)
 # =============================================================================
@@ -1013,14 +3764,6 @@ class FORGE_PT_main(bpy.types.Panel):
         if _last_activity:
             layout.label(text=f"→ {_last_activity}", icon='INFO')
         
-        # Loading indicator
-        if scene.forge_loading:
-            row = layout.row()
-            row.alert = True
-            row.label(text="Working...", icon='TIME')
-            row.operator("forge.stop", text="Stop", icon='CANCEL')
-            layout.separator()
-        
         # ─── Task Input ───
         box = layout.box()
         box.label(text="Task:", icon='CONSOLE')
@@ -1028,7 +3771,7 @@ class FORGE_PT_main(bpy.types.Panel):
         
         row = box.row(align=True)
         row.scale_y = 1.3
-        row.enabled = not scene.forge_loading
+        row.enabled = not _jobs.busy('chat')
         row.operator("forge.send", text="Send", icon='EXPORT')
         row.operator("forge.clear", text="", icon='TRASH')
         
@@ -1038,7 +3781,7 @@ class FORGE_PT_main(bpy.types.Panel):
             box.prop(p.preferences, "auto_execute", text="🤖 Auto-Execute")
         
         # ─── History ───
-        history = get_response_history(scene)
+        history = _panel_state.history(scene)
         if history:
             row = layout.row(align=True)
             row.operator("forge.history_prev", text="", icon='TRIA_LEFT')
@@ -1054,7 +3797,10 @@ class FORGE_PT_main(bpy.types.Panel):
         # ─── Response ───
         if scene.forge_response:
             box = layout.box()
-            box.label(text="Response:", icon='TEXT')
+            row = box.row()
+            row.label(text="Response:", icon='TEXT')
+            if _response_cache_hit:
+                row.label(text="⚡ Cached (no API call)", icon='FILE_CACHE')
             wrap_text(context, scene.forge_response, box)
             
             if scene.forge_code:
@@ -1066,6 +3812,39 @@ class FORGE_PT_main(bpy.types.Panel):
                     layout.label(text=scene.forge_result)
 
 
+# =============================================================================
+# UI - Jobs Panel (live list of background work)
+# =============================================================================
+
+class FORGE_PT_jobs(bpy.types.Panel):
+    bl_label = "⏳ Jobs"
+    bl_idname = "FORGE_PT_jobs"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'Forge'
+
+    @classmethod
+    def poll(cls, context):
+        return bool(_jobs.jobs)
+
+    def draw(self, context):
+        layout = self.layout
+        jobs = _jobs.snapshot()
+        
+        if any(job.active for job in jobs):
+            row = layout.row()
+            row.alert = True
+            row.operator("forge.stop", text="Stop All", icon='CANCEL')
+        
+        col = layout.column(align=True)
+        for job in reversed(jobs):
+            row = col.row(align=True)
+            row.alert = job.state == 'failed'
+            row.label(text=job.summary()[:48], icon=JOB_ICONS[job.state])
+            if job.active:
+                row.operator("forge.cancel_job", text="", icon='X').job_id = job.id
+
+
 # =============================================================================
 # UI - Project Panel (Context + Profile)
 # =============================================================================
@@ -1091,7 +3870,7 @@ class FORGE_PT_project(bpy.types.Panel):
         row.operator("forge.reset_profile", text="", icon='LOOP_BACK')
         
         # ─── Profile Display ───
-        profile = get_project_profile(scene)
+        profile = _panel_state.profile(scene)
         
         box = layout.box()
         box.label(text="Profile:", icon='SETTINGS')
@@ -1114,7 +3893,7 @@ class FORGE_PT_project(bpy.types.Panel):
         row.label(text="Log:", icon='TEXT')
         row.operator("forge.clear_log", text="", icon='TRASH')
         
-        log = get_project_log(scene)
+        log = _panel_state.log(scene)
         if log:
             for entry in log[-5:]:
                 box.label(text=entry[:40])
@@ -1148,7 +3927,6 @@ class FORGE_PT_texture(bpy.types.Panel):
         
         row = box.row()
         row.scale_y = 1.2
-        row.enabled = not scene.forge_loading
         row.operator("forge.gen_texture", text="Generate", icon='RENDER_STILL')
         
         if _texture_path:
@@ -1164,11 +3942,17 @@ class FORGE_PT_texture(bpy.types.Panel):
             row = box.row()
             row.prop(p.preferences, "auto_apply", text="Auto-Apply")
             row.prop(p.preferences, "hq_mode", text="HQ Mode")
+            if p.preferences.hq_mode:
+                row = box.row()
+                row.prop(p.preferences, "derive_maps", text="Derive Maps")
+                row.prop(p.preferences, "pack_orm", text="Pack ORM")
         
         col = box.column(align=True)
-        col.enabled = not scene.forge_loading
         col.operator("forge.auto_texture", text="Selected Object", icon='OBJECT_DATA')
-        col.operator("forge.auto_texture_all", text="All Objects", icon='OUTLINER')
+        row = col.row()
+        row.enabled = not _jobs.busy('batch')
+        row.operator("forge.auto_texture_all", text="All Objects", icon='OUTLINER')
+        row.operator("forge.bake_atlas", text="", icon='IMGDISPLAY')
         
         # ─── Result ───
         if scene.forge_texture_result:
@@ -1176,13 +3960,13 @@ class FORGE_PT_texture(bpy.types.Panel):
         
         # ─── Scene Objects ───
         layout.separator()
-        mesh_objs = [o for o in bpy.data.objects if o.type == 'MESH']
-        if mesh_objs:
+        mesh_count, mesh_rows = _panel_state.meshes(scene)
+        if mesh_count:
             box = layout.box()
-            box.label(text=f"Meshes ({len(mesh_objs)}):", icon='OUTLINER')
-            for obj in mesh_objs[:5]:
-                icon = 'CHECKMARK' if obj.data.materials else 'CHECKBOX_DEHLT'
-                box.label(text=obj.name, icon=icon)
+            box.label(text=f"Meshes ({mesh_count}):", icon='OUTLINER')
+            for name, has_material in mesh_rows:
+                icon = 'CHECKMARK' if has_material else 'CHECKBOX_DEHLT'
+                box.label(text=name, icon=icon)
 
 
 # =============================================================================
@@ -1194,16 +3978,11 @@ class FORGE_OT_test(bpy.types.Operator):
     bl_label = "Test"
 
     def execute(self, context):
-        context.scene.forge_loading = True
-        def test():
-            test_connection()
-            def done():
-                context.scene.forge_loading = False
-                for a in bpy.context.screen.areas:
-                    if a.type == 'VIEW_3D': a.tag_redraw()
-                return None
-            bpy.app.timers.register(done, first_interval=0.1)
-        threading.Thread(target=test, daemon=True).start()
+        def test(job):
+            ok, msg = test_connection()
+            if not ok:
+                raise Exception(msg)
+        _jobs.submit('test', "Connection test", test)
         return {'FINISHED'}
 
 
@@ -1219,78 +3998,114 @@ class FORGE_OT_stop(bpy.types.Operator):
     bl_idname = "forge.stop"
     bl_label = "Stop"
     def execute(self, context):
-        global _stop_requested
-        _stop_requested = True
-        context.scene.forge_loading = False
+        _jobs.cancel()  # Close in-flight sockets, drop queued jobs
         set_status("⏹️ Stopped", "")
         return {'FINISHED'}
 
 
+class FORGE_OT_cancel_job(bpy.types.Operator):
+    bl_idname = "forge.cancel_job"
+    bl_label = "Cancel Job"
+    bl_description = "Stop this job"
+    
+    job_id: bpy.props.IntProperty()
+    
+    def execute(self, context):
+        if not _jobs.cancel(self.job_id):
+            return {'CANCELLED'}
+        return {'FINISHED'}
+
+
 class FORGE_OT_send(bpy.types.Operator):
     bl_idname = "forge.send"
     bl_label = "Send"
 
     def execute(self, context):
-        global _stop_requested, _chat_history
-        _stop_requested = False
+        global _chat_history, _response_cache_hit
         
         scene = context.scene
         msg = scene.forge_message.strip()
         
         if not msg: return {'CANCELLED'}
-        if scene.forge_loading: return {'CANCELLED'}
+        if _jobs.busy('chat'): return {'CANCELLED'}
         if not get_key():
             bpy.ops.forge.prefs()
             return {'CANCELLED'}
         
         scene.forge_error = ""
-        scene.forge_loading = True
         scene.forge_code = ""
         scene.forge_result = ""
+        _response_cache_hit = False
         
         log_action(f"[USER] {msg[:50]}...")
         
-        full_msg = f"[Scene: {get_context()}]\n\n{msg}"
+        scene_ctx = get_context()
+        full_msg = f"[Scene: {scene_ctx}]\n\n{msg}"
+        
+        def show_reply(resp, code):
+            scene.forge_response = resp
+            scene.forge_code = code or ""
+            scene.forge_message = ""
+            
+            add_to_history(scene, resp, code or "")
+            
+            if is_auto() and code:
+                run_code(code)
+                scene.forge_result = "✅ Auto-executed"
+        
+        # Memoized reply: same request against an unchanged scene
+        cache_key = response_cache_key(get_model(), msg, scene_ctx) if is_response_cache() else None
+        cached = get_cached_response(cache_key) if cache_key else None
+        if cached:
+            _chat_history.append({"role": "user", "parts": [{"text": full_msg}]})
+            _chat_history.append({"role": "model", "parts": [{"text": cached["response"]}]})
+            _response_cache_hit = True
+            set_status("⚡ Cached reply", "No API call")
+            log_action("[CACHE] Reply reused")
+            show_reply(cached["response"], cached["code"])
+            return {'FINISHED'}
+        
         _chat_history.append({"role": "user", "parts": [{"text": full_msg}]})
         
-        def send():
+        streamed = {"code": None}
+        
+        def send(job):
+            def on_text(text):
+                # Extract code as soon as the closing fence has arrived
+                if streamed["code"] is None and text.count("```") >= 2:
+                    streamed["code"] = extract_code(text)
+                code = streamed["code"]
+                job.report(None, f"{len(text)} chars")
+                def update():
+                    if not job.cancelled:
+                        scene.forge_response = text
+                        if code:
+                            scene.forge_code = code
+                run_on_main(update)
+            
             try:
-                resp = call_api(_chat_history, get_system())
+                messages, system, cacheable = prepare_chat(_chat_history)
+                resp = call_api(messages, system, on_text, use_cache=cacheable)
                 _chat_history.append({"role": "model", "parts": [{"text": resp}]})
-                code = extract_code(resp)
+                code = streamed["code"] or extract_code(resp)
+                if cache_key and resp:
+                    store_response(cache_key, resp, code)
                 
                 def done():
-                    if _stop_requested:
-                        scene.forge_loading = False
-                        return None
-                    
-                    scene.forge_response = resp
-                    scene.forge_code = code or ""
-                    scene.forge_message = ""
-                    
-                    add_to_history(scene, resp, code or "")
-                    
-                    if is_auto() and code:
-                        run_code(code)
-                        scene.forge_result = "✅ Auto-executed"
-                    
-                    scene.forge_loading = False
-                    for a in bpy.context.screen.areas:
-                        if a.type == 'VIEW_3D': a.tag_redraw()
-                    return None
+                    if not job.cancelled:
+                        show_reply(resp, code)
                 
-                bpy.app.timers.register(done, first_interval=0.1)
+                run_on_main(done)
                 
             except Exception as e:
                 if _chat_history and _chat_history[-1]["role"] == "user":
                     _chat_history.pop()
                 def err():
                     scene.forge_error = str(e)[:80]
-                    scene.forge_loading = False
-                    return None
-                bpy.app.timers.register(err, first_interval=0.1)
+                run_on_main(err)
+                raise
         
-        threading.Thread(target=send, daemon=True).start()
+        _jobs.submit('chat', msg[:24], send)
         return {'FINISHED'}
 
 
@@ -1317,9 +4132,10 @@ class FORGE_OT_clear(bpy.types.Operator):
     bl_idname = "forge.clear"
     bl_label = "Clear"
     def execute(self, context):
-        global _chat_history, _history_index
+        global _chat_history, _history_index, _response_cache_hit
         _chat_history = []
         _history_index = -1
+        _response_cache_hit = False
         s = context.scene
         s.forge_message = ""
         s.forge_response = ""
@@ -1346,30 +4162,26 @@ class FORGE_OT_analyze_profile(bpy.types.Operator):
         if not get_key():
             bpy.ops.forge.prefs()
             return {'CANCELLED'}
+        if _jobs.busy('profile'):
+            return {'CANCELLED'}
         
-        scene.forge_loading = True
         set_status("🔍 Analyzing...", "Inferring profile")
         
-        def analyze():
+        def analyze(job):
             try:
                 profile = infer_profile_from_description(desc)
                 def done():
                     set_project_profile(scene, profile)
-                    scene.forge_loading = False
                     set_status("✅ Profile set", profile.get('art_style', ''))
                     log_action(f"[PROFILE] {profile.get('art_style')} / {profile.get('shading')}")
-                    for a in bpy.context.screen.areas:
-                        if a.type == 'VIEW_3D': a.tag_redraw()
-                    return None
-                bpy.app.timers.register(done, first_interval=0.1)
+                run_on_main(done)
             except Exception as e:
                 def err():
-                    scene.forge_loading = False
                     set_status("❌ Profile failed", str(e)[:30])
-                    return None
-                bpy.app.timers.register(err, first_interval=0.1)
+                run_on_main(err)
+                raise
         
-        threading.Thread(target=analyze, daemon=True).start()
+        _jobs.submit('profile', "Analyze profile", analyze)
         return {'FINISHED'}
 
 
@@ -1388,17 +4200,30 @@ class FORGE_OT_clear_log(bpy.types.Operator):
     bl_idname = "forge.clear_log"
     bl_label = "Clear Log"
     def execute(self, context):
-        set_project_log(context.scene, [])
+        _project_log.clear()
+        _project_log.flush()
         context.scene.forge_response_history = ""
         return {'FINISHED'}
 
 
+class FORGE_OT_clear_cache(bpy.types.Operator):
+    bl_idname = "forge.clear_cache"
+    bl_label = "Clear Cache"
+    bl_description = "Delete all cached textures and replies from disk"
+    def execute(self, context):
+        _texture_cache.clear()
+        _response_cache.clear()
+        set_status("⚪ Cache cleared", "")
+        return {'FINISHED'}
+
+
 class FORGE_OT_history_prev(bpy.types.Operator):
     bl_idname = "forge.history_prev"
     bl_label = "Previous"
     def execute(self, context):
-        global _history_index
+        global _history_index, _response_cache_hit
         history = get_response_history(context.scene)
+        _response_cache_hit = False
         if history and _history_index > 0:
             _history_index -= 1
             entry = history[_history_index]
@@ -1411,8 +4236,9 @@ class FORGE_OT_history_next(bpy.types.Operator):
     bl_idname = "forge.history_next"
     bl_label = "Next"
     def execute(self, context):
-        global _history_index
+        global _history_index, _response_cache_hit
         history = get_response_history(context.scene)
+        _response_cache_hit = False
         if history and _history_index < len(history) - 1:
             _history_index += 1
             entry = history[_history_index]
@@ -1442,6 +4268,7 @@ class FORGE_OT_apply_cached_material(bpy.types.Operator):
             obj.data.materials[0] = mat
         else:
             obj.data.materials.append(mat)
+            _panel_state.invalidate('meshes')
             
         # Apply UVs if needed
         try:
@@ -1458,8 +4285,6 @@ class FORGE_OT_gen_texture(bpy.types.Operator):
     bl_idname = "forge.gen_texture"
     bl_label = "Generate"
     def execute(self, context):
-        global _stop_requested
-        _stop_requested = False
         scene = context.scene
         prompt = scene.forge_texture_prompt.strip()
         if not prompt: return {'CANCELLED'}
@@ -1473,15 +4298,16 @@ class FORGE_OT_gen_texture(bpy.types.Operator):
         if obj_context:
             prompt = f"{prompt}. {obj_context}"
         
-        scene.forge_loading = True
         scene.forge_texture_result = ""
         size = get_texture_size()
+        tier = current_tier()
         
-        def gen():
+        def gen(job):
             try:
                 path, _ = generate_texture(prompt, size)
+                if path:
+                    texture_tier(path, tier)
                 def done():
-                    scene.forge_loading = False
                     if path:
                         scene.forge_texture_result = f"✅ {os.path.basename(path)}"
                         # Auto-apply if enabled and object selected
@@ -1490,18 +4316,14 @@ class FORGE_OT_gen_texture(bpy.types.Operator):
                             scene.forge_texture_result += f" → {obj.name}"
                     else:
                         scene.forge_texture_result = "No image"
-                    for a in bpy.context.screen.areas:
-                        if a.type == 'VIEW_3D': a.tag_redraw()
-                    return None
-                bpy.app.timers.register(done, first_interval=0.1)
+                run_on_main(done)
             except Exception as e:
                 def err():
-                    scene.forge_loading = False
                     scene.forge_texture_result = f"❌ {str(e)[:60]}"
-                    return None
-                bpy.app.timers.register(err, first_interval=0.1)
+                run_on_main(err)
+                raise
         
-        threading.Thread(target=gen, daemon=True).start()
+        _jobs.submit('texture', prompt[:24], gen)
         return {'FINISHED'}
 
 
@@ -1522,8 +4344,6 @@ class FORGE_OT_auto_texture(bpy.types.Operator):
     bl_description = "Generate texture for selected object using profile"
     
     def execute(self, context):
-        global _stop_requested
-        _stop_requested = False
         obj = context.active_object
         if not obj or obj.type != 'MESH': return {'CANCELLED'}
         if not get_key():
@@ -1531,7 +4351,7 @@ class FORGE_OT_auto_texture(bpy.types.Operator):
             return {'CANCELLED'}
         
         scene = context.scene
-        scene.forge_loading = True
+        obj_name = obj.name
         
         # Use profile-based settings
         profile = get_project_profile(scene)
@@ -1544,11 +4364,19 @@ class FORGE_OT_auto_texture(bpy.types.Operator):
         except:
             pass
         
-        def gen():
+        def gen(job):
             try:
                 if use_hq:
-                    # HQ Mode: Generate full texture set
-                    texture_set = generate_texture_set(prompt, profile, obj.name)
+                    # HQ Mode: Generate full texture set, applying maps as they arrive
+                    total = len(set(profile.get('maps', [])) | {'base_color'})
+                    def on_map(map_type, partial_set):
+                        job.report(len(partial_set) / total, MAP_LABELS[map_type])
+                        def apply_partial():
+                            if not job.cancelled:
+                                apply_texture_set_to_object(obj, partial_set, profile, partial=True)
+                        run_on_main(apply_partial)
+                    
+                    texture_set = generate_texture_set(prompt, profile, obj_name, on_map)
                     def done():
                         if texture_set:
                             apply_texture_set_to_object(obj, texture_set, profile)
@@ -1556,32 +4384,25 @@ class FORGE_OT_auto_texture(bpy.types.Operator):
                             scene.forge_texture_result = f"✅ {obj.name} ({map_count} maps)"
                         else:
                             scene.forge_texture_result = "Failed"
-                        scene.forge_loading = False
-                        for a in bpy.context.screen.areas:
-                            if a.type == 'VIEW_3D': a.tag_redraw()
-                        return None
-                    bpy.app.timers.register(done, first_interval=0.1)
+                    run_on_main(done)
                 else:
                     # Fast Mode: Single texture
                     size = profile.get('resolution', get_texture_size())
                     path, _ = generate_texture(prompt, size)
+                    if path:
+                        texture_tier(path, target_tier(profile))
                     def done():
                         if path: 
                             apply_texture_to_object(obj, path, profile)
-                        scene.forge_loading = False
                         scene.forge_texture_result = f"✅ {obj.name}" if path else "Failed"
-                        for a in bpy.context.screen.areas:
-                            if a.type == 'VIEW_3D': a.tag_redraw()
-                        return None
-                    bpy.app.timers.register(done, first_interval=0.1)
+                    run_on_main(done)
             except Exception as e:
                 def err():
-                    scene.forge_loading = False
                     scene.forge_texture_result = f"❌ {str(e)[:60]}"
-                    return None
-                bpy.app.timers.register(err, first_interval=0.1)
+                run_on_main(err)
+                raise
         
-        threading.Thread(target=gen, daemon=True).start()
+        _jobs.submit('texture', obj_name, gen)
         return {'FINISHED'}
 
 
@@ -1589,50 +4410,249 @@ class FORGE_OT_auto_texture_all(bpy.types.Operator):
     bl_idname = "forge.auto_texture_all"
     bl_label = "Auto All"
     def execute(self, context):
-        global _stop_requested
-        _stop_requested = False
         mesh_objs = [o for o in bpy.data.objects if o.type == 'MESH']
         if not mesh_objs: return {'CANCELLED'}
+        if _jobs.busy('batch'): return {'CANCELLED'}
         if not get_key():
             bpy.ops.forge.prefs()
             return {'CANCELLED'}
         
         scene = context.scene
-        scene.forge_loading = True
         
         # Use profile-based settings
         profile = get_project_profile(scene)
         size = profile.get('resolution', get_texture_size())
         
-        def gen_all():
-            done_count = [0]
-            for i, obj in enumerate(mesh_objs):
-                if _stop_requested: break
-                set_status(f"🎨 {i+1}/{len(mesh_objs)}", obj.name)
-                try:
-                    prompt = get_texture_prompt_for_profile(obj, profile)
-                    path, _ = generate_texture(prompt, size)
-                    if path:
-                        def apply_tex(o=obj, p=path):
-                            apply_texture_to_object(o, p)
-                            return None
-                        bpy.app.timers.register(apply_tex, first_interval=0.1)
-                        done_count[0] += 1
-                except: pass
+        # Prompts are built here - worker threads only see names and strings
+        jobs = [(o.name, get_texture_prompt_for_profile(o, profile)) for o in mesh_objs]
+        batch = TextureBatch(jobs, profile, size, use_hq=is_hq_mode(), workers=get_max_workers())
+        
+        def gen_all(job):
+            def on_result(obj_name, texture_set):
+                def apply_tex():
+                    obj = bpy.data.objects.get(obj_name)
+                    if obj:
+                        if batch.use_hq:
+                            apply_texture_set_to_object(obj, texture_set, profile)
+                        else:
+                            apply_texture_to_object(obj, texture_set['base_color'], profile)
+                run_on_main(apply_tex)
+            
+            batch.run(on_result)
             
             def finish():
-                scene.forge_loading = False
-                scene.forge_texture_result = f"✅ {done_count[0]}/{len(mesh_objs)}"
-                set_status("✅ Done", "")
-                for a in bpy.context.screen.areas:
-                    if a.type == 'VIEW_3D': a.tag_redraw()
-                return None
-            bpy.app.timers.register(finish, first_interval=0.5)
+                scene.forge_texture_result = batch.summary()
+                set_status("✅ Done" if not batch.failed else "⚠️ Done with errors", "")
+            run_on_main(finish)
+            job.report(None, batch.summary())
         
-        threading.Thread(target=gen_all, daemon=True).start()
+        _jobs.submit('batch', f"Texture {len(jobs)} objects", gen_all)
+        return {'FINISHED'}
+
+
+class FORGE_OT_bake_atlas(bpy.types.Operator):
+    bl_idname = "forge.bake_atlas"
+    bl_label = "Bake Atlas"
+    bl_description = "Pack the textures of all BlenderForge-textured meshes into shared atlases (one material per atlas, fewer draw calls)"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    def execute(self, context):
+        start = time.perf_counter()
+        changed, pages, scaled = bake_atlas([o for o in context.scene.objects if o.type == 'MESH'])
+        if not changed:
+            self.report({'WARNING'}, "No BlenderForge-textured meshes with UVs")
+            return {'CANCELLED'}
+        if scaled:
+            self.report({'WARNING'}, f"{len(scaled)} objects tile their texture - UVs scaled to fit the atlas")
+        context.scene.forge_texture_result = f"✅ Atlas: {changed} objects → {pages} material(s)"
+        set_status("✅ Atlas baked", f"{time.perf_counter() - start:.1f}s")
         return {'FINISHED'}
 
 
+# =============================================================================
+# Benchmarks (run from Blender's Python console: import blenderforge as bf)
+# =============================================================================
+
+def benchmark_material_factory(count=200):
+    """Cost per material: node-by-node build (old path) vs template copy + image swap."""
+    image = bpy.data.images.new("Forge_Bench", 64, 64)
+    created = []
+    
+    def per_material(fn):
+        start = time.perf_counter()
+        for i in range(count):
+            mat = fn(i)
+            for node_name in ('Base Color', 'Roughness', 'Normal'):
+                mat.node_tree.nodes[node_name].image = image
+            created.append(mat)
+        return (time.perf_counter() - start) / count * 1000
+    
+    def build(i):
+        mat = bpy.data.materials.new(name=f"Forge_Bench_Build_{i}")
+        build_pbr_nodes(mat, True, True)
+        return mat
+    
+    def clone(i):
+        mat = get_material_template(('pbr', True, True)).copy()
+        mat.name = f"Forge_Bench_Clone_{i}"
+        return mat
+    
+    try:
+        results = {"build_ms": per_material(build), "clone_ms": per_material(clone)}
+    finally:
+        for mat in created:
+            bpy.data.materials.remove(mat)
+        bpy.data.images.remove(image)
+    
+    results["speedup"] = results["build_ms"] / max(results["clone_ms"], 1e-9)
+    print(f"[BlenderForge] material factory x{count}: build {results['build_ms']:.3f} ms, "
+          f"clone {results['clone_ms']:.3f} ms ({results['speedup']:.1f}x)")
+    return results
+
+
+def benchmark_texture_decode(size_mb=24):
+    """Peak memory decoding a synthetic 4K-sized image response: json.loads path vs streaming."""
+    import tracemalloc
+    
+    image = os.urandom(int(size_mb * 1024 * 1024 * 3 / 4))
+    body = json.dumps({"candidates": [{"content": {"parts": [
+        {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(image).decode('ascii')}}
+    ]}}]}).encode('utf-8')
+    del image
+    target = os.path.join(tempfile.gettempdir(), "forge_bench_decode.bin")
+    
+    def full_parse():
+        result = json.loads(body.decode('utf-8'))
+        data = base64.b64decode(result['candidates'][0]['content']['parts'][0]['inlineData']['data'])
+        with open(target, 'wb') as f:
+            f.write(data)
+    
+    def streaming():
+        with open(target, 'wb') as f:
+            stream_inline_data(io.BytesIO(body), f)
+    
+    results = {}
+    for name, fn in (("full_mb", full_parse), ("stream_mb", streaming)):
+        tracemalloc.start()
+        start = time.perf_counter()
+        fn()
+        results[name.replace("_mb", "_s")] = time.perf_counter() - start
+        results[name] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+        tracemalloc.stop()
+    os.remove(target)
+    
+    print(f"[BlenderForge] decode {len(body) / 1048576:.1f} MB response: peak "
+          f"{results['full_mb']:.1f} MB (json) vs {results['stream_mb']:.1f} MB (stream)")
+    return results
+
+
+def check_texture_decode(chunk_sizes=(1, 3, 7, 13, 16, 17, 4096)):
+    """Streaming decoder vs base64 for tiny reads, with the data field at every offset."""
+    image = os.urandom(500)
+    failures = []
+    for offset in range(20):
+        body = json.dumps({"candidates": [{"content": {"parts": [
+            {"text": "x" * offset},
+            {"inlineData": {"mimeType": "image/png", "data": base64.b64encode(image).decode('ascii')}}
+        ]}}]}).encode('utf-8')
+        for size in chunk_sizes:
+            out = io.BytesIO()
+            skeleton, _ = stream_inline_data(io.BytesIO(body), out, chunk_size=size)
+            if out.getvalue() != image or b'"data": ""' not in skeleton:
+                failures.append((offset, size))
+    
+    print(f"[BlenderForge] texture decode check: " +
+          (f"{len(failures)} failures {failures[:5]}" if failures else "ok"))
+    return not failures
+
+
+def check_atlas_packing(count=20, source=2048):
+    """Atlas layout for count equal generated textures at every tier: no overlaps,
+    at most ceil(count / 4) pages (plus one for a short last row), and no more
+    texels than the tier variants the atlas replaces.
+    """
+    failures = []
+    for tier in TIER_SIZES:
+        tiles, placements, dims = plan_atlas([(source, source)] * count, tier)
+        cells = [(p, x, y, x + w + 2 * ATLAS_PADDING, y + h + 2 * ATLAS_PADDING)
+                 for (w, h), (p, x, y) in zip(tiles, placements)]
+        overlap = any(a[0] == b[0] and a[1] < b[3] and b[1] < a[3] and a[2] < b[4] and b[2] < a[4]
+                      for i, a in enumerate(cells) for b in cells[i + 1:])
+        outside = any(c[3] > dims[c[0]][0] or c[4] > dims[c[0]][1] for c in cells)
+        budget = count * np.prod(tier_size(source, source, tier))
+        texels = sum(w * h for w, h in dims)
+        if overlap or outside or len(dims) > -(-count // 4) + 1 or texels > budget:
+            failures.append((tier, len(dims), tiles[0], f"{texels / budget:.2f}x texels"))
+    
+    print(f"[BlenderForge] atlas packing check ({count} x {source}px): " +
+          (f"failed {failures}" if failures else "ok"))
+    return not failures
+
+
+def benchmark_panel_draw(iterations=200):
+    """Per-redraw data cost of the sidebar panels: uncached (old path) vs PanelState."""
+    scene = bpy.context.scene
+    text = scene.forge_response or "x " * 2000
+    
+    def uncached():
+        get_response_history(scene)
+        get_project_profile(scene)
+        json.loads(scene.forge_project_log or "[]")
+        mesh_objs = [o for o in bpy.data.objects if o.type == 'MESH']
+        [bool(o.data.materials) for o in mesh_objs[:5]]
+        wrapper = textwrap.TextWrapper(width=40)
+        for part in text.split("\n"):
+            wrapper.wrap(part)
+    
+    def cached():
+        _panel_state.history(scene)
+        _panel_state.profile(scene)
+        _panel_state.log(scene)
+        _panel_state.meshes(scene)
+        wrap_lines(text, 40)
+    
+    results = {}
+    for name, fn in (("uncached_ms", uncached), ("cached_ms", cached)):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        results[name] = (time.perf_counter() - start) / iterations * 1000
+    
+    print(f"[BlenderForge] panel data per redraw ({len(bpy.data.objects)} objects): "
+          f"{results['uncached_ms']:.3f} ms uncached vs {results['cached_ms']:.4f} ms cached")
+    return results
+
+
+def benchmark_uv_classifier():
+    """Time to read face data and pick a UV projection for every mesh in the file."""
+    meshes = [o for o in bpy.data.objects if o.type == 'MESH']
+    counts = collections.Counter()
+    start = time.perf_counter()
+    for obj in meshes:
+        counts[classify_uv(*face_data(obj.data))[0]] += 1
+    total_ms = (time.perf_counter() - start) * 1000
+    
+    print(f"[BlenderForge] UV classifier: {len(meshes)} meshes in {total_ms:.1f} ms "
+          f"({total_ms / max(1, len(meshes)):.3f} ms each) - " +
+          ", ".join(f"{UV_LABELS[m]} {n}" for m, n in counts.most_common()))
+    return {'total_ms': total_ms, 'counts': dict(counts)}
+
+
+def benchmark_pbr_derivation(sizes=(512, 1024, 2048)):
+    """CPU time to derive Roughness + Normal + AO locally from a synthetic base color."""
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in sizes:
+        rgba = rng.random((size, size, 4), dtype=np.float32)
+        start = time.perf_counter()
+        derive_pbr_pixels(rgba)
+        results[size] = (time.perf_counter() - start) * 1000
+    
+    print("[BlenderForge] local PBR derivation: " +
+          ", ".join(f"{size}px {ms:.0f} ms" for size, ms in results.items()))
+    return results
+
+
 # =============================================================================
 # Registration
 # =============================================================================
@@ -1640,11 +4660,13 @@ class FORGE_OT_auto_texture_all(bpy.types.Operator):
 classes = (
     ForgePreferences,
     FORGE_PT_main,
+    FORGE_PT_jobs,
     FORGE_PT_texture,
     FORGE_PT_project,
     FORGE_OT_test,
     FORGE_OT_prefs,
     FORGE_OT_stop,
+    FORGE_OT_cancel_job,
     FORGE_OT_send,
     FORGE_OT_run,
     FORGE_OT_copy,
@@ -1652,12 +4674,14 @@ classes = (
     FORGE_OT_analyze_profile,
     FORGE_OT_reset_profile,
     FORGE_OT_clear_log,
+    FORGE_OT_clear_cache,
     FORGE_OT_history_prev,
     FORGE_OT_history_next,
     FORGE_OT_gen_texture,
     FORGE_OT_apply_texture,
     FORGE_OT_auto_texture,
     FORGE_OT_auto_texture_all,
+    FORGE_OT_bake_atlas,
     FORGE_OT_apply_cached_material,
 )
 
@@ -1671,7 +4695,6 @@ def register():
     bpy.types.Scene.forge_error = bpy.props.StringProperty(name="Error")
     bpy.types.Scene.forge_code = bpy.props.StringProperty(name="Code")
     bpy.types.Scene.forge_result = bpy.props.StringProperty(name="Result")
-    bpy.types.Scene.forge_loading = bpy.props.BoolProperty(name="Loading")
     bpy.types.Scene.forge_texture_prompt = bpy.props.StringProperty(name="Texture")
     bpy.types.Scene.forge_texture_result = bpy.props.StringProperty(name="Tex Result")
     bpy.types.Scene.forge_project_desc = bpy.props.StringProperty(
@@ -1680,24 +4703,49 @@ def register():
     )
     bpy.types.Scene.forge_project_log = bpy.props.StringProperty(
         name="Log",
-        description="Project action log (JSON)"
+        description="Project action log (JSON)",
+        update=invalidate_panel('log')
     )
     bpy.types.Scene.forge_response_history = bpy.props.StringProperty(
         name="History",
-        description="Response history (JSON)"
+        description="Response history (JSON)",
+        update=invalidate_panel('history')
     )
     bpy.types.Scene.forge_project_profile = bpy.props.StringProperty(
         name="Profile",
-        description="Project profile (JSON)"
+        description="Project profile (JSON)",
+        update=invalidate_panel('profile')
     )
+    
+    bpy.app.timers.register(drain_main_queue, persistent=True)
+    bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
+    bpy.app.handlers.load_post.append(on_load_post)
+    bpy.app.handlers.save_pre.append(flush_project_log)
+    bpy.app.timers.register(flush_project_log, first_interval=LOG_FLUSH_INTERVAL, persistent=True)
+    bpy.app.handlers.undo_post.append(on_undo_redo)
+    bpy.app.handlers.redo_post.append(on_undo_redo)
 
 
 def unregister():
+    flush_project_log()
+    for timer in (drain_main_queue, flush_project_log):
+        if bpy.app.timers.is_registered(timer):
+            bpy.app.timers.unregister(timer)
+    for handlers, fn in ((bpy.app.handlers.depsgraph_update_post, on_depsgraph_update),
+                         (bpy.app.handlers.load_post, on_load_post),
+                         (bpy.app.handlers.save_pre, flush_project_log),
+                         (bpy.app.handlers.undo_post, on_undo_redo),
+                         (bpy.app.handlers.redo_post, on_undo_redo)):
+        if fn in handlers:
+            handlers.remove(fn)
+    _jobs.shutdown()
+    close_pools()
+    
     for cls in reversed(classes):
         bpy.utils.unregister_class(cls)
     
     for p in ['forge_message', 'forge_response', 'forge_error', 'forge_code',
-              'forge_result', 'forge_loading', 'forge_texture_prompt', 'forge_texture_result',
+              'forge_result', 'forge_texture_prompt', 'forge_texture_result',
               'forge_project_desc', 'forge_project_log', 'forge_response_history',
               'forge_project_profile']:
         if hasattr(bpy.types.Scene, p):